@@ -0,0 +1,238 @@
+#!/usr/bin/env python
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+
+import sway_monitors
+from sway_monitors import Setup
+from sway_monitors.record import ReplayConnection, read_recording
+from benchmarks.simulated import SimulatedConnection, generate_outputs
+
+THRESHOLDS = os.path.join(os.path.dirname(__file__), 'thresholds.json')
+
+SCENARIOS = [
+    {'outputs': 1, 'modes': 10, 'profiles': 1},
+    {'outputs': 3, 'modes': 30, 'profiles': 4},
+    {'outputs': 4, 'modes': 200, 'profiles': 12},
+    {'outputs': 16, 'modes': 60, 'profiles': 12},
+    {'outputs': 16, 'modes': 200, 'profiles': 12},
+]
+
+
+def calibrate(repeat):
+    # Decoding a fixed reply is the unit the timings are divided by, so thresholds hold on slower machines
+    payload = json.dumps(generate_outputs(16, 200))
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        json.loads(payload)
+        timings.append(time.perf_counter() - start)
+
+    return statistics.median(timings) * 1000
+
+
+def build_profiles(connection, count):
+    # Most profiles do not match, like a laptop that knows about every meeting room
+    outputs = connection.outputs
+    profiles = {}
+    for i in range(count - 1):
+        profiles['missing_{:n}'.format(i)] = [{'serial': 'MISSING{:n}'.format(i)}, {'model': 'SIM 0', 'serial': outputs[0]['serial']}]
+
+    profiles['connected'] = [{'serial': output['serial']} for output in outputs]
+    return profiles
+
+
+def operations(scenario, latency):
+    connection = SimulatedConnection(scenario['outputs'], scenario['modes'], latency=latency)
+    setup = Setup(connection=connection)
+    profiles = build_profiles(connection, scenario['profiles'])
+    targets = profiles['connected']
+
+    def fetch_monitors():
+        setup.fetch_monitors()
+
+    def find_monitor():
+        for props in targets:
+            setup.find_monitor(props)
+
+    def check_setup():
+        for props_list in profiles.values():
+            setup.check_setup(props_list)
+
+    def get_highest_mode():
+        for monitor in setup.monitors:
+            monitor.get_highest_mode()
+
+    def enable():
+        setup.enable(targets)
+
+    def enable_transaction():
+        setup.enable(targets, transaction=True)
+
+    def apply_profiles():
+        setup.apply_profiles(profiles)
+
+    return connection, [
+        ('fetch_monitors', fetch_monitors),
+        ('find_monitor', find_monitor),
+        ('check_setup', check_setup),
+        ('get_highest_mode', get_highest_mode),
+        ('enable', enable),
+        ('enable_transaction', enable_transaction),
+        ('apply_profiles', apply_profiles),
+    ]
+
+
+def measure(connection, operation, repeat, unit_ms):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        operation()
+        timings.append(time.perf_counter() - start)
+
+    connection.reset_calls()
+    tracemalloc.start()
+    operation()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    # Memory is relative to the size of the reply sway would send for this scenario
+    time_ms = statistics.median(timings) * 1000
+    return {
+        'time_ms': time_ms,
+        'time_ratio': time_ms / unit_ms,
+        'round_trips': connection.round_trips(),
+        'peak_kib': peak / 1024,
+        'peak_ratio': peak / len(connection.payload),
+    }
+
+
+def run(scenarios=None, repeat=None, latency=None):
+    if scenarios is None:
+        scenarios = SCENARIOS
+
+    if repeat is None:
+        repeat = 20
+
+    if latency is None:
+        latency = 0
+
+    unit_ms = calibrate(repeat)
+    results = {}
+    for scenario in scenarios:
+        connection, ops = operations(scenario, latency)
+        name = '{outputs:n}x{modes:n}/{profiles:n}'.format(**scenario)
+        for operation, function in ops:
+            results['{:s} {:s}'.format(name, operation)] = measure(connection, function, repeat, unit_ms)
+
+    return results
+
+
+def replay(path, profiles, repeat=None, speed=None):
+    # A captured session answers the IPC calls, so real hardware can be benchmarked offline
+    if repeat is None:
+        repeat = 20
+
+    records = read_recording(path)
+    timings = []
+    for _ in range(repeat):
+        connection = ReplayConnection(json.loads(json.dumps(records)), speed)
+        start = time.perf_counter()
+        Setup(connection=connection).apply_profiles(profiles)
+        timings.append(time.perf_counter() - start)
+
+    remaining = connection.get_remaining()
+    total = {kind: len([record for record in records if record['type'] == kind]) for kind in remaining}
+    return {'replay apply_profiles': {
+        'time_ms': statistics.median(timings) * 1000,
+        'round_trips': sum(total.values()) - sum(remaining.values()),
+        'mismatches': len(connection.mismatches),
+    }}
+
+
+def check(results, thresholds, latency=None):
+    if latency is None:
+        latency = 0
+
+    # Simulated latency dominates the timings, they are only comparable to thresholds recorded with the same latency
+    metrics = ['round_trips', 'peak_ratio']
+    if latency == thresholds.get('latency', 0):
+        metrics.append('time_ratio')
+
+    regressions = []
+    for key, result in results.items():
+        threshold = thresholds.get('results', {}).get(key)
+        if threshold is None:
+            continue
+
+        for metric in metrics:
+            if metric in threshold and result[metric] > threshold[metric]:
+                regressions.append('{:s}: {:s} {:.2f} > {:.2f}'.format(key, metric, result[metric], threshold[metric]))
+
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark profile resolution and apply paths against a simulated sway')
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--latency', type=float, default=0, help='Simulated IPC latency in seconds')
+    parser.add_argument('--json', action='store_true', help='Print the results as JSON')
+    parser.add_argument('--thresholds', default=THRESHOLDS)
+    parser.add_argument('--recording', help='Benchmark a recorded session instead of the simulated scenarios')
+    parser.add_argument('--profiles', help='Profiles file to apply to the recorded session')
+    parser.add_argument('--speed', type=float, help='Replay the recorded latencies divided by this factor')
+    parser.add_argument('--update-thresholds', action='store_true', help='Write the current results, with headroom, as the new thresholds')
+    args = parser.parse_args(argv)
+
+    # The library logs every apply, keep the report readable
+    sway_monitors.logger.setLevel('WARNING')
+    if args.recording:
+        if not args.profiles:
+            parser.error('--recording needs --profiles')
+
+        with open(args.profiles) as f:
+            results = replay(args.recording, json.loads(f.read()), args.repeat, args.speed)
+
+        print(json.dumps(results, indent=2, sort_keys=True))
+        return 0
+
+    results = run(repeat=args.repeat, latency=args.latency)
+
+    if args.json:
+        print(json.dumps(results, indent=2, sort_keys=True))
+    else:
+        print('{:<40s} {:>10s} {:>12s} {:>10s}'.format('operation', 'time (ms)', 'round trips', 'peak KiB'))
+        for key, result in results.items():
+            print('{:<40s} {:>10.3f} {:>12n} {:>10.1f}'.format(key, result['time_ms'], result['round_trips'], result['peak_kib']))
+
+    if args.update_thresholds:
+        # Round trips are deterministic, the ratios get headroom for noisy machines
+        thresholds = {'latency': args.latency, 'results': {key: {
+            'time_ratio': round(result['time_ratio'] * 3 + 0.05, 3),
+            'round_trips': result['round_trips'],
+            'peak_ratio': round(result['peak_ratio'] * 1.5 + 0.05, 3),
+        } for key, result in results.items()}}
+        with open(args.thresholds, 'w') as f:
+            f.write(json.dumps(thresholds, indent=2, sort_keys=True))
+            f.write('\n')
+
+        return 0
+
+    if os.path.exists(args.thresholds):
+        with open(args.thresholds) as f:
+            regressions = check(results, json.loads(f.read()), args.latency)
+
+        for regression in regressions:
+            print('REGRESSION {:s}'.format(regression), file=sys.stderr)
+
+        return 1 if regressions else 0
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
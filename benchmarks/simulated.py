@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+import json
+import time
+from sway_monitors import _split_commands
+
+RESOLUTIONS = [
+    (640, 480), (720, 400), (800, 600), (1024, 768), (1280, 720), (1280, 1024), (1440, 900), (1600, 900),
+    (1680, 1050), (1920, 1080), (1920, 1200), (2560, 1080), (2560, 1440), (3440, 1440), (3840, 2160),
+]
+REFRESH_RATES = [23976, 24000, 25000, 29970, 30000, 50000, 59940, 60000, 75000, 100000, 120000, 144000, 165000]
+
+
+def generate_modes(count):
+    modes = []
+    for i in range(count):
+        width, height = RESOLUTIONS[i % len(RESOLUTIONS)]
+        refresh = REFRESH_RATES[(i // len(RESOLUTIONS)) % len(REFRESH_RATES)]
+        modes.append({'width': width, 'height': height, 'refresh': refresh + i // (len(RESOLUTIONS) * len(REFRESH_RATES))})
+
+    return modes
+
+
+def generate_outputs(outputs, modes, active=None):
+    if active is None:
+        active = outputs
+
+    data = []
+    x = 0
+    for i in range(outputs):
+        output_modes = generate_modes(modes)
+        current_mode = max(output_modes, key=lambda mode: (mode['width'] * mode['height'], mode['refresh']))
+        data.append({
+            'name': 'DP-{:n}'.format(i + 1),
+            'type': 'output',
+            'active': i < active,
+            'make': 'Simulated Inc.',
+            'model': 'SIM {:n}'.format(i % 4),
+            'serial': 'SN{:04n}'.format(i),
+            'rect': {'x': x, 'y': 0, 'width': current_mode['width'], 'height': current_mode['height']},
+            'scale': 1.0,
+            'transform': 'normal',
+            'modes': output_modes,
+            'current_mode': current_mode,
+        })
+        x += current_mode['width']
+
+    return data
+
+
+class SimulatedConnection:
+    def __init__(self, outputs=3, modes=30, active=None, latency=0):
+        self.command_list = []
+        self.outputs = generate_outputs(outputs, modes, active)
+        # Decode on every call like a real IPC reply would be
+        self.payload = json.dumps(self.outputs)
+        self.latency = latency
+        self.calls = {'command': 0, 'get_outputs': 0, 'get_workspaces': 0}
+
+    def command(self, command):
+        # Every mode is valid on simulated hardware, so every sub-command succeeds
+        self.calls['command'] += 1
+        self._wait()
+        self.command_list.append(command)
+        return [{'success': True} for _ in _split_commands(command)]
+
+    def get_outputs(self):
+        self.calls['get_outputs'] += 1
+        self._wait()
+        return json.loads(self.payload)
+
+    def get_workspaces(self):
+        self.calls['get_workspaces'] += 1
+        self._wait()
+        return []
+
+    def reset_calls(self):
+        self.calls = {'command': 0, 'get_outputs': 0, 'get_workspaces': 0}
+
+    def round_trips(self):
+        return sum(self.calls.values())
+
+    def _wait(self):
+        if self.latency:
+            time.sleep(self.latency)
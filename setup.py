@@ -15,6 +15,12 @@ setup(
     author_email="daniel@voogsgerd.nl",
     url=url,
     install_requires=[],
+    entry_points={
+        'console_scripts': ['sway-monitors=sway_monitors.cli:main'],
+    },
+    extras_require={
+        'wallpaper': ['Pillow'],
+    },
     # download_url="{}/tarball/{}".format(url, version),
     license="ISC"
 )
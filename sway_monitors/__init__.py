@@ -1,14 +1,63 @@
+import contextlib
+import importlib
 import logging
 import json
 import os
+import threading
+from array import array
 
-__all__ = ['Monitor', 'MonitorNode', 'Setup']
+from .instrument import InstrumentedConnection, JsonLinesSink, Metrics, operation
+
+__all__ = ['BandwidthCache', 'BaseSetup', 'BandwidthPlanner', 'CachedConnection', 'Coordinator', 'InstrumentedConnection', 'JsonLinesSink', 'LayoutCache', 'LayoutEngine', 'Metrics', 'ModeCache', 'ModeSelector', 'ModeTable', 'Monitor', 'MonitorIndex', 'MonitorNode', 'OutputState', 'Placement', 'Profile', 'ProfileMatch', 'ProfileSet', 'Reconciler', 'RecordingConnection', 'ReplayConnection', 'Setup', 'Snapshot', 'Transaction', 'WallpaperCache']
 
 logger = logging.getLogger(__name__)
-logging.basicConfig(level=logging.INFO, format='%(asctime)s %(module)s %(levelname)s %(message)s')
+
+# Hotplug scripts run cold on every dock event, only load these once they are used
+_LAZY_MODULES = {
+    'LayoutCache': 'cache',
+    'BandwidthCache': 'cache',
+    'ModeCache': 'cache',
+    'LayoutEngine': 'layout',
+    'BandwidthPlanner': 'modes',
+    'ModeSelector': 'modes',
+    'ModeTable': 'modes',
+    'Placement': 'layout',
+    'Profile': 'profiles',
+    'ProfileMatch': 'profiles',
+    'ProfileSet': 'profiles',
+    'OutputState': 'snapshot',
+    'Snapshot': 'snapshot',
+    'CachedConnection': 'outputs',
+    'Coordinator': 'seats',
+    'Reconciler': 'reconcile',
+    'RecordingConnection': 'record',
+    'ReplayConnection': 'record',
+    'SwayConnection': 'ipc',
+    'WallpaperCache': 'wallpaper',
+}
+
+
+def __getattr__(name):
+    if name not in _LAZY_MODULES:
+        raise AttributeError('module {!r} has no attribute {!r}'.format(__name__, name))
+
+    return getattr(importlib.import_module('.' + _LAZY_MODULES[name], __name__), name)
+
+
+def _connect():
+    try:
+        import i3ipc
+    except ImportError:
+        # Fall back to the built in client when i3ipc is not installed
+        from .ipc import SwayConnection
+        return SwayConnection()
+
+    return i3ipc.Connection()
 
 
 class MonitorMode:
+    __slots__ = ('width', 'height', 'refresh', 'active', '_key')
+
     def __init__(self, properties):
         try:
             self.height = properties['height']
@@ -17,76 +66,159 @@ class MonitorMode:
         except AttributeError:
             raise Exception('MonitorNode is not a valid node')
 
+        self.active = False
+        # Pixels first, refresh rate breaks ties, the dimensions only make the ordering total
+        self._key = (self.width * self.height, self.refresh, self.width, self.height)
+
     # Getters
     def get_dimensions(self) -> tuple:
         return self.width, self.height
 
+    def get_properties(self) -> dict:
+        return {'width': self.width, 'height': self.height, 'refresh': self.refresh}
+
+    def get_pixel_clock(self) -> int:
+        # Pixels per second, ignores blanking so it is a lower bound of what the link has to carry
+        return self.width * self.height * self.refresh // 1000
+
     # Check
     def has_dimensions(self, size) -> bool:
         return self.width == size['width'] and self.height == size['height']
 
     # Private
     def total_pixels(self) -> int:
-        return self.width * self.height
+        return self._key[0]
 
     # Magic
     def __gt__(self, other):
-        if self.total_pixels() > other.total_pixels():
-            return True
-
-        if self.total_pixels() == other.total_pixels() and self.refresh > other.refresh:
-            return True
+        if not isinstance(other, MonitorMode):
+            return NotImplemented
 
-        return False
+        return self._key > other._key
 
     def __lt__(self, other):
-        if self.total_pixels() < other.total_pixels():
-            return True
-
-        if self.total_pixels() == other.total_pixels() and self.refresh < other.refresh:
-            return True
+        if not isinstance(other, MonitorMode):
+            return NotImplemented
 
-        return False
+        return self._key < other._key
 
     def __ge__(self, other):
         if not isinstance(other, MonitorMode):
-            raise NotImplemented('Comparing MonitorNodes to non-MonitorNodes is not supported (yet)')
+            return NotImplemented
 
-        # You might want to do this with total ordering
-        return self.__eq__(other) or self.__gt__(other)
+        return self._key >= other._key
 
     def __le__(self, other):
         if not isinstance(other, MonitorMode):
-            raise NotImplemented('Comparing MonitorNodes to non-MonitorNodes is not supported (yet)')
+            return NotImplemented
 
-        # You might want to do this with total ordering
-        return self.__eq__(other) or self.__lt__(other)
+        return self._key <= other._key
 
     def __eq__(self, other):
         if not isinstance(other, MonitorMode):
-            raise NotImplemented('Comparing MonitorNodes to non-MonitorNodes is not supported (yet)')
+            return NotImplemented
+
+        return self._key == other._key
 
-        return self.height == other.height and self.width == other.width and self.refresh == other.refresh
+    def __hash__(self):
+        return hash(self._key)
+
+    def __repr__(self):
+        return 'MonitorMode({:n}x{:n}@{:n})'.format(self.width, self.height, self.refresh)
 
 
 class Monitor:
     def __init__(self, meta_data, connection):
+        self.connection = connection
+        # Sway does not report backgrounds, remember the last one we set
+        self.current_background = None
+        self.update(meta_data)
+
+    # Modes are parsed the first time they are needed, matching setups only needs the meta data
+    @property
+    def modes(self):
+        self._ensure_modes()
+        return self._modes
+
+    @modes.setter
+    def modes(self, modes):
+        self._raw_modes = None
+        self._index_modes(list(modes))
+
+    @property
+    def modes_by_dimensions(self):
+        self._ensure_modes()
+        return self._modes_by_dimensions
+
+    @property
+    def active_mode(self):
+        self._ensure_modes()
+        return self._active_mode
+
+    @property
+    def mode_columns(self):
+        # Width, height and refresh of every mode as flat arrays, in the same order as modes
+        self._ensure_modes()
+        if self._mode_columns is None:
+            self._mode_columns = (
+                array('l', [mode.width for mode in self._modes]),
+                array('l', [mode.height for mode in self._modes]),
+                array('l', [mode.refresh for mode in self._modes]),
+            )
+
+        return self._mode_columns
+
+    def update(self, meta_data):
         # TODO: Validate if screen valid @p :6
         self._set_modes(meta_data.pop('modes'), meta_data.pop('current_mode') if 'current_mode' in meta_data else None)
         self.name = meta_data['name']
         self.active = meta_data.pop('active')
         self.meta_data = meta_data
-        self.connection = connection
 
     # Actions
     def enable(self, pos=None, mode=None, background=None):
         # TODO: Check if output exists and is disabled @p :1
+        self.perform(self.enable_actions(pos, mode, background))
 
+    def disable(self):
+        self.perform(['disable'])
+
+    def background(self, path, sizing=None, cache=None):
+        if cache is not None and self.get_active_mode() is not None:
+            from .wallpaper import output_size
+            path = cache.get(path, output_size(self.get_active_mode(), self.meta_data.get('transform')), sizing)
+
+        self.perform(self.background_actions(path, sizing))
+
+    def mode(self, mode):
+        if not isinstance(mode, MonitorMode):
+            raise TypeError('Not a valid mode was provided')
+
+        self.perform("resolution {:n}x{:n}".format(mode['height'], mode['width']))
+
+    def refresh_modes(self, identifier=None):
+        if identifier is None:
+            identifier = 'name'
+
+        self._refresh_modes_from(self.connection.get_outputs(), identifier)
+
+    def perform(self, actions):
+        res = self.connection.command(self.build_command(actions))
+        if res[0]['success'] == False:
+            raise CommandError('Command failed: {:s}'.format(res[0].get('error', 'unknown error')), failed=[self.build_command(actions)])
+
+        self._track_background(actions)
+
+    def build_command(self, actions):
+        command_parts = ["output {:s}".format(self.name)]
+        command_parts.extend(actions)
+        return " ".join(command_parts)
+
+    def enable_actions(self, pos=None, mode=None, background=None):
         actions = []
 
         if pos is None:
-            self.perform(["enable"])
-            return
+            return ["enable"]
 
         if mode is None:
             mode = self.get_highest_mode()
@@ -100,12 +232,9 @@ class Monitor:
         if background:
             actions.append("bg {:s} fill".format(background))
 
-        self.perform(actions)
-
-    def disable(self):
-        self.perform(['disable'])
+        return actions
 
-    def background(self, path, sizing=None):
+    def background_actions(self, path, sizing=None):
         if not sizing:
             sizing = "fill"
 
@@ -113,29 +242,7 @@ class Monitor:
         if not os.path.exists(path):
             raise FileNotFoundError('Specified background does not exists')
 
-        self.perform(["bg {:s} {:s}".format(path, sizing)])
-
-    def mode(self, mode):
-        if not isinstance(mode, MonitorMode):
-            raise TypeError('Not a valid mode was provided')
-
-        self.perform("resolution {:n}x{:n}".format(mode['height'], mode['width']))
-
-    def refresh_modes(self, identifier=None):
-        if identifier is None:
-            identifier = 'name'
-
-        data = self.connection.get_outputs()
-        for monitor_data in data:
-            if monitor_data[identifier] == self.meta_data[identifier]:
-                self._set_modes(monitor_data.pop('modes'), monitor_data.pop('current_mode') if 'current_mode' in monitor_data else None)
-
-    def perform(self, actions):
-        command_parts = ["output {:s}".format(self.name)]
-        command_parts.extend(actions)
-        res = self.connection.command(" ".join(command_parts))
-        if res[0]['success'] == False:
-            raise Exception('Command failed')
+        return ["bg {:s} {:s}".format(path, sizing)]
 
     # Checks
     def has_property(self, prop):
@@ -150,16 +257,24 @@ class Monitor:
         return True
 
     def find_mode(self, expected_mode):
-        for mode in self.meta_data['modes']:
-            for expected_mode_attr, expected_value in expected_mode.items():
-                if not mode[expected_mode_attr] == expected_value:
-                    break
+        # Highest mode matching all given properties, None when there is none
+        columns = dict(zip(('width', 'height', 'refresh'), self.mode_columns))
+        rows = range(len(self.modes) - 1, -1, -1)
+        for prop, value in expected_mode.items():
+            column = columns[prop]
+            rows = [row for row in rows if column[row] == value]
 
-        return False
+        return self.modes[rows[0]] if len(rows) > 0 else None
 
     def has_mode(self, expected_mode):
         raise NotImplemented('Has mode is not implented yet')
 
+    def has_modes(self):
+        if self._modes is None:
+            return len(self._raw_modes) > 0
+
+        return len(self._modes) > 0
+
     def is_active(self):
         return self.active
 
@@ -167,26 +282,32 @@ class Monitor:
     def get_attr(self):
         return self.meta_data
 
+    def get_mode_properties(self):
+        if self._modes is not None:
+            return [mode.get_properties() for mode in self._modes]
+
+        modes = [{'width': mode['width'], 'height': mode['height'], 'refresh': mode['refresh']} for mode in self._raw_modes]
+        return sorted(modes, key=lambda mode: (mode['width'] * mode['height'], mode['refresh'], mode['width'], mode['height']))
+
+    def get_identifier(self):
+        return self.meta_data.get('make'), self.meta_data.get('model'), self.meta_data.get('serial')
+
     def get_highest_mode(self):
-        if not self.is_active():
+        if not self.has_modes() and not self.is_active():
+            # Disabled outputs do not always report their modes
             # TODO: We could enable the monitor to get the modes, but this walks into race condititions @p :0
             self.enable()
             self.refresh_modes()
             #raise Exception('Monitor is not active')
 
-        if len(self.modes) == 0:
-            raise Exception('Monitor has no modes')
-
-        return max(self.modes)
+        return self._highest_mode()
 
     def get_active_mode(self):
-        for mode in self.modes:
-            if mode.active:
-                return mode
+        return self.active_mode
 
     def get_mode(self, props):
         # TODO: Check if mode has the right refresh rate @p :10
-        matching_modes = [mode for mode in self.modes if mode.has_dimensions(props)]
+        matching_modes = self.modes_by_dimensions.get((props['width'], props['height']), [])
 
         if len(matching_modes) == 0:
             raise MonitorModeNotFoundError()
@@ -197,90 +318,272 @@ class Monitor:
 
         return matching_modes
 
+    def select_mode(self, width=None, height=None, refresh=None):
+        # Solving a layout asks for the same modes over and over, remember the choices until the modes change
+        self._ensure_modes()
+        key = (width, height, refresh)
+        if key in self._mode_choices:
+            return self._mode_choices[key]
+
+        if width is None or height is None:
+            candidates = self.modes_by_dimensions[self._highest_mode().get_dimensions()]
+        else:
+            candidates = self.modes_by_dimensions.get((width, height), [])
+            if len(candidates) == 0:
+                raise MonitorModeNotFoundError('{:s} has no {:n}x{:n} mode'.format(self.name, width, height))
+
+        if refresh is None:
+            mode = candidates[-1]
+        else:
+            mode = min(reversed(candidates), key=lambda candidate: abs(candidate.refresh - refresh))
+
+        self._mode_choices[key] = mode
+        return mode
+
     # Private
+    def _highest_mode(self):
+        if len(self.modes) == 0:
+            raise Exception('Monitor has no modes')
+
+        # Modes are kept sorted
+        return self.modes[-1]
+
+    def _track_background(self, actions):
+        for action in actions:
+            if action.startswith('bg '):
+                self.current_background = action[3:]
+
+    def _refresh_modes_from(self, data, identifier):
+        for monitor_data in data:
+            if monitor_data[identifier] == self.meta_data[identifier]:
+                self._set_modes(monitor_data.pop('modes'), monitor_data.pop('current_mode') if 'current_mode' in monitor_data else None)
+
     def _set_modes(self, modes, active=None):
-        self.modes = [MonitorMode(mode) for mode in modes]
+        self._raw_modes = modes
+        self._raw_active_mode = active
+        self._modes = None
+
+    def _ensure_modes(self):
+        if self._modes is None:
+            self._index_modes(sorted(MonitorMode(mode) for mode in self._raw_modes), self._raw_active_mode)
+            self._raw_modes = None
+
+    def _index_modes(self, modes, active=None):
+        self._modes = modes
+        self._mode_columns = None
+        self._mode_choices = {}
+        self._modes_by_dimensions = {}
+        for mode in modes:
+            self._modes_by_dimensions.setdefault(mode.get_dimensions(), []).append(mode)
+
+        self._active_mode = None
         if active:
             self._set_active_mode(active)
 
     def _set_active_mode(self, active):
         active_mode = MonitorMode(active)
-        for mode in self.modes:
+        for mode in self._modes_by_dimensions.get(active_mode.get_dimensions(), []):
             mode.active = mode == active_mode
+            if mode.active:
+                self._active_mode = mode
 
 
-class Setup:
-    def __init__(self, fetch=True, connection=None):
+class BaseSetup:
+    # Everything that only looks at the monitors, Setup and AsyncSetup add the calls to sway on top
+    monitor_class = Monitor
+    # Policies from sway_monitors.modes to choose modes with, the highest mode of each monitor when None
+    mode_policies = None
+
+    def __init__(self, connection, mode_cache=None, wallpaper_cache=None, diff=False):
         self.monitors = None
-        if connection:
-            self.connection = connection
-        else:
-            import i3ipc
-            self.connection = i3ipc.Connection()
-        if fetch:
-            self.fetch_monitors()
+        self.diff = diff
+        self.index = MonitorIndex()
+        self.connection = connection
+        self.mode_cache = mode_cache
+        self.wallpaper_cache = wallpaper_cache
 
     # Actions
-    def fetch_monitors(self):
+    def load_monitors(self, data):
         monitors = []
-        for monitor_data in self.connection.get_outputs():
-            monitors.append(Monitor(monitor_data, self.connection))
+        for monitor in data:
+            monitors.append(self.monitor_class(monitor, self.connection))
 
         self.monitors = monitors
+        self.index.rebuild(monitors)
+        if self.mode_cache is not None:
+            self.mode_cache.update(monitors)
 
-    def load_monitors(self, data):
+    def update_monitors(self, data):
+        # Keep the existing monitor objects around, only touch the index for outputs that changed
+        current = {monitor.name: monitor for monitor in self.monitors or []}
         monitors = []
-        for monitor in data:
-            monitors.append(Monitor(monitor, self.connection))
+        added = []
+        for monitor_data in data:
+            monitor = current.pop(monitor_data['name'], None)
+            if monitor is None:
+                monitor = self.monitor_class(monitor_data, self.connection)
+                self.index.add(monitor)
+                added.append(monitor)
+            else:
+                monitor.update(monitor_data)
+                self.index.reindex(monitor)
+
+            monitors.append(monitor)
+
+        removed = list(current.values())
+        for monitor in removed:
+            self.index.remove(monitor)
+
+        if self.mode_cache is not None:
+            self.mode_cache.update(monitors)
 
         self.monitors = monitors
+        return added, removed
+
+    @operation('match_profiles')
+    def match_profiles(self, profiles):
+        profiles = self._profile_set(profiles)
+
+        match = profiles.match(self)
+        for name, reason in match.failures.items():
+            logger.debug('Profile {:s} not used: {:s}'.format(name, reason))
+
+        return match
+
+    # Private
+    def _profile_set(self, profiles):
+        from .profiles import ProfileSet
+        if isinstance(profiles, ProfileSet):
+            return profiles
 
-    def enable(self, monitors, direction=None):
+        return ProfileSet.from_dict(profiles)
+
+    def _direction(self, direction):
         if direction is None:
             direction = "right"
 
-        monitors = [self.find_monitor(props) for props in monitors]
+        if direction not in ["right", "left", "down", "up"]:
+            raise ValueError('direction was not a proper direction')
 
-        # TODO: Maybe abstract this as well
+        return direction
+
+    def _stale(self, monitors, fetch=True):
+        # Monitors whose modes have to be fetched from sway
+        stale = [monitor for monitor in monitors if not monitor.has_modes()]
+        if self.mode_cache is not None:
+            stale = [monitor for monitor in stale if not self.mode_cache.apply(monitor)]
+
+        if len(stale) > 0 and not fetch:
+            # Planning only looks, and sway only reports these modes once the outputs are enabled
+            raise MonitorModeNotFoundError('Modes of {:s} are not known without enabling them'.format(', '.join(monitor.name for monitor in stale)))
+
+        return stale
+
+    def _workspace_plan(self, rules, monitors, workspaces):
+        current = {}
+        focused = None
+        for workspace in workspaces:
+            workspace = getattr(workspace, 'ipc_data', workspace)
+            current[workspace['name']] = workspace['output']
+            if workspace.get('focused'):
+                focused = workspace['name']
+
+        # Sway moves the workspaces of disabled outputs by itself, where they end up is not known up front
+        staying = {monitor.name for monitor in monitors}
+        commands = []
+        moves = []
+        for name, props in rules.items():
+            candidates = [monitor for monitor in self.find_monitors(props) if monitor.name in staying]
+            if len(candidates) != 1:
+                logger.warning('Workspace {:s} does not match exactly one output of the layout, leaving it'.format(name))
+                continue
+
+            output = candidates[0].name
+            commands.append('workspace {:s} output {:s}'.format(_quote(name), output))
+            if name in current and (current[name] != output or current[name] not in staying):
+                moves.append('workspace --no-auto-back-and-forth {:s}'.format(_quote(name)))
+                moves.append('move workspace to output {:s}'.format(output))
+
+        if len(moves) > 0 and focused is not None:
+            # Moving a workspace focuses it, end up where the user was
+            moves.append('workspace --no-auto-back-and-forth {:s}'.format(_quote(focused)))
+
+        return commands + moves
+
+    def _check_workspaces(self, commands, res):
+        failed = [command for command, reply in zip(commands, res) if reply['success'] == False]
+        if len(failed) > 0:
+            raise CommandError('Moving workspaces failed: {:s}'.format(', '.join(failed)), failed=failed)
+
+    def _restored(self, snapshot, res):
+        for monitor in self.monitors or []:
+            state = snapshot.get(monitor.name)
+            if state is not None:
+                monitor.current_background = state.background
+
+        if any(reply['success'] == False for reply in res):
+            raise CommandError('Restoring the snapshot failed')
+
+    def _plan(self, monitors, layout, background=None, backgrounds=None, prepare=True):
         # Disable monitors we are not going to use in the new setup
-        for monitor in self.get_active_monitors():
-            if monitor not in monitors:
-                monitor.disable()
+        plan = [(monitor, ['disable']) for monitor in self.get_active_monitors() if monitor not in monitors]
 
-        logger.info('Enabling {:n} monitors'.format(len(monitors)))
-        if direction in ['up', 'left']:
-            monitors = reversed(monitors)
-
-        if direction in ["right", "left"]:
-            x_total = 0
-            for monitor in monitors:
-                mode = monitor.get_highest_mode()
-                monitor.enable((x_total, 0), mode)
-                x_total += mode.width
-        elif direction in ["down", "up"]:
-            y_total = 0
-            for monitor in monitors:
-                mode = monitor.get_highest_mode()
-                monitor.enable((0, y_total), mode)
-                y_total += mode.height
+        if backgrounds is None:
+            backgrounds = self._layout_backgrounds(layout, background, prepare)
+
+        for placement, background in zip(layout, backgrounds):
+            actions = placement.get_changes(background) if self.diff else placement.get_actions(background)
+            if len(actions) > 0:
+                plan.append((placement.monitor, actions))
+
+        return plan
+
+    def _layout_backgrounds(self, layout, background, prepare=True):
+        # One background per placement, scaled to its output when there is a wallpaper cache
+        if not background or self.wallpaper_cache is None:
+            return [background] * len(layout)
+
+        return self._backgrounds(background, [(placement.mode, placement.transform) for placement in layout], prepare=prepare)
+
+    def _backgrounds(self, path, targets, sizing=None, prepare=True):
+        if self.wallpaper_cache is None:
+            return [path] * len(targets)
+
+        # Every output size is scaled in one go, so the pool works on all of them in parallel.
+        # Without prepare only the paths are worked out, planning should not scale or write anything
+        from .wallpaper import output_size
+        sizes = [output_size(mode, transform) for mode, transform in targets]
+        if prepare:
+            paths = self.wallpaper_cache.prepare(path, sizes, sizing)
         else:
-            raise ValueError('direction was not a proper direction')
+            paths = self.wallpaper_cache.get_paths(path, sizes, sizing)
 
-    def disable_all_monitors(self):
-        # Bad idea, sway does not like it if you have no monitors enabled
-        for monitor in self.get_active_monitors():
-            monitor.disable()
+        return [paths[size] for size in sizes]
+
+    def _prepare_backgrounds(self, path, sizing=None):
+        monitors = list(self.get_active_monitors())
+        if self.wallpaper_cache is not None:
+            monitors = [monitor for monitor in monitors if monitor.get_active_mode() is not None]
+
+        targets = [(monitor.get_active_mode(), monitor.meta_data.get('transform')) for monitor in monitors]
+        return list(zip(monitors, self._backgrounds(path, targets, sizing)))
+
+    def _commands(self, plan):
+        return [monitor.build_command(actions) for monitor, actions in plan]
 
+    def _place(self, monitors, modes, direction, refresh=False):
+        from .layout import LayoutEngine
+        return LayoutEngine().solve(LayoutEngine.strip(monitors, modes, direction, refresh))
 
     # Checks
     def is_connected(self, screen_properties):
         # TODO: Think of a clearer name for this method @p :1
-        try:
-            self.find_monitor(screen_properties)
-            return True
-        except MonitorNotFoundError:
-            # TODO: Custom monitor not found exception @p :2
-            return False
+        monitors = self.find_monitors(screen_properties)
+
+        if len(monitors) > 1:
+            raise AmbigiousMonitorError('Monitor is ambigious')
+
+        return len(monitors) == 1
 
     def check_setup(self, props_list):
         for props in props_list:
@@ -294,8 +597,36 @@ class Setup:
         monitors = self.monitors
         return filter(lambda monitor: monitor.active, monitors)
 
+    def get_fingerprint(self):
+        from .cache import LayoutCache
+        return LayoutCache.fingerprint([dict(monitor.meta_data) for monitor in self.monitors])
+
+    def get_layout_commands(self):
+        return self.snapshot().get_commands()
+
+    def select_modes(self, monitors, policies=None):
+        # All monitors are scored together, policies like a bandwidth cap span more than one monitor
+        if policies is None:
+            policies = self.mode_policies
+
+        from .modes import ModeSelector
+        return ModeSelector(policies).select(monitors)
+
+    def snapshot(self):
+        from .snapshot import Snapshot
+        return Snapshot.from_monitors(self.monitors)
+
+    def find_monitors(self, properties):
+        candidates, remaining = self.index.lookup(properties)
+        monitors = [monitor for monitor in self.monitors if candidates is None or monitor in candidates]
+
+        if remaining:
+            monitors = [monitor for monitor in monitors if monitor.has_properties(remaining)]
+
+        return monitors
+
     def find_monitor(self, properties):
-        monitor = list(filter(lambda monitor: monitor.has_properties(properties), self.monitors))
+        monitor = self.find_monitors(properties)
 
         if len(monitor) > 1:
             raise AmbigiousMonitorError('Monitor is ambigious')
@@ -306,6 +637,428 @@ class Setup:
         return monitor[0]
 
 
+class Setup(BaseSetup):
+    # BandwidthPlanner that enable() retries lower modes with when a dock can not drive the highest ones
+    bandwidth_planner = None
+
+    def __init__(self, fetch=True, connection=None, mode_cache=None, layout_cache=None, diff=False, wallpaper_cache=None):
+        super().__init__(connection or _connect(), mode_cache, wallpaper_cache, diff)
+        self.layout_cache = layout_cache
+        self.last_transaction = None
+        self.last_layout = None
+        self._refresh_lock = threading.Lock()
+        if fetch:
+            self.fetch_monitors()
+
+    # Actions
+    def instrument(self, *sinks):
+        if not isinstance(self.connection, InstrumentedConnection):
+            self.connection = InstrumentedConnection(self.connection)
+            for monitor in self.monitors or []:
+                monitor.connection = self.connection
+
+        self.connection.sinks.extend(sinks)
+        return self.connection
+
+    def cache_outputs(self):
+        from .outputs import CachedConnection
+        # Below the instrumentation, so it keeps counting the round trips that actually reach sway
+        parent = self.connection if isinstance(self.connection, InstrumentedConnection) else self
+        if not isinstance(parent.connection, CachedConnection):
+            parent.connection = CachedConnection(parent.connection)
+            for monitor in self.monitors or []:
+                monitor.connection = self.connection
+
+        return parent.connection
+
+    @operation('fetch_monitors')
+    def fetch_monitors(self):
+        self.load_monitors(self.connection.get_outputs())
+
+    @operation('enable')
+    def enable(self, monitors, direction=None, background=None, transaction=False, workspaces=None):
+        if self.bandwidth_planner is not None:
+            return self.bandwidth_planner.enable(self, monitors, direction, background, workspaces)
+
+        monitors, layout = self._resolve_enable(monitors, direction)
+        self._run(monitors, layout, background, transaction, workspaces)
+
+    @operation('arrange')
+    def arrange(self, entries, background=None, transaction=True, workspaces=None):
+        monitors, layout = self._resolve_arrange(entries)
+        self._run(monitors, layout, background, transaction, workspaces)
+        return layout
+
+    @operation('background')
+    def background(self, path, sizing=None, transaction=True):
+        backgrounds = self._prepare_backgrounds(path, sizing)
+        if transaction:
+            with self.transaction():
+                self._set_backgrounds(backgrounds, sizing)
+        else:
+            self._set_backgrounds(backgrounds, sizing)
+
+    @operation('plan')
+    def plan(self, monitors, direction=None, background=None):
+        monitors, layout = self._resolve_enable(monitors, direction, fetch=False)
+        return self._commands(self._plan(monitors, layout, background, prepare=False))
+
+    @operation('plan_layout')
+    def plan_layout(self, entries, background=None):
+        monitors, layout = self._resolve_arrange(entries, fetch=False)
+        return self._commands(self._plan(monitors, layout, background, prepare=False))
+
+    @operation('plan_workspaces')
+    def plan_workspaces(self, rules, monitors=None):
+        # rules map workspace names to the properties of the monitor they belong on
+        if monitors is None:
+            monitors = list(self.get_active_monitors())
+
+        return self._workspace_plan(rules, monitors, self.connection.get_workspaces())
+
+    @operation('plan_profiles')
+    def plan_profiles(self, profiles, direction=None):
+        match = self.match_profiles(profiles)
+        if not match:
+            return None, []
+
+        profile = match.profile
+        if profile.has_layout():
+            return profile.name, self.plan_layout(profile.get_layout())
+
+        return profile.name, self.plan(profile.monitors, profile.direction or direction)
+
+    @operation('resolve_modes')
+    def resolve_modes(self, monitors, fetch=True):
+        stale = self._stale(monitors, fetch)
+        if len(stale) == 0:
+            return
+
+        # Disabled outputs do not always report their modes, enable them and refresh them from a single snapshot
+        logger.info('Fetching modes for {:n} monitors'.format(len(stale)))
+        for monitor in stale:
+            if not monitor.is_active():
+                monitor.enable()
+
+        data = self.connection.get_outputs()
+        for monitor in stale:
+            monitor._refresh_modes_from(data, 'name')
+
+        if self.mode_cache is not None:
+            self.mode_cache.update(stale)
+
+    @operation('restore')
+    def restore(self, snapshot):
+        logger.warning('Restoring {:n} outputs from snapshot'.format(len(snapshot)))
+        self._restored(snapshot, self.connection.command(snapshot.get_command()))
+
+    @contextlib.contextmanager
+    def transaction(self):
+        transaction = Transaction(self.connection, self.get_layout_commands())
+        self.last_transaction = transaction
+        connections = [(monitor, monitor.connection) for monitor in self.monitors]
+        for monitor in self.monitors:
+            monitor.connection = transaction
+
+        try:
+            yield transaction
+        finally:
+            for monitor, connection in connections:
+                monitor.connection = connection
+
+        transaction.commit()
+
+    @operation('apply_profiles')
+    def apply_profiles(self, profiles, direction=None):
+        profiles = self._profile_set(profiles)
+
+        match = self.match_profiles(profiles)
+        if not match:
+            logger.warning('None of the {:n} profiles match the connected monitors'.format(len(profiles)))
+            return None
+
+        profile = match.profile
+        logger.info('Applying profile {:s}'.format(profile.name))
+        if profile.has_layout():
+            self.arrange(profile.get_layout(), workspaces=profile.workspaces)
+        else:
+            self.enable(profile.monitors, profile.direction or direction, transaction=True, workspaces=profile.workspaces)
+
+        if self.layout_cache is not None:
+            if profile.workspaces:
+                # Where the workspaces go depends on where they are at the time, a replay can not know that
+                self.layout_cache.invalidate(self.get_fingerprint())
+            else:
+                self.layout_cache.store(self.get_fingerprint(), profile.name, self._replay_command(self.last_layout))
+
+        return profile.name
+
+    @operation('replay_layout')
+    def replay_layout(self):
+        # Cold start: replay the layout we resolved last time for this exact hardware
+        data = self.connection.get_outputs()
+        from .cache import LayoutCache
+        fingerprint = LayoutCache.fingerprint(data)
+        entry = self.layout_cache.get(fingerprint) if self.layout_cache is not None else None
+        if entry is not None:
+            res = self.connection.command(entry['command'])
+            if all(reply['success'] != False for reply in res):
+                logger.info('Replayed cached layout of profile {:s}'.format(entry['profile']))
+                return entry['profile']
+
+            logger.warning('Cached layout failed, resolving profiles again')
+            self.layout_cache.invalidate(fingerprint)
+
+        self.load_monitors(data)
+        return None
+
+    @operation('refresh')
+    def refresh(self, profiles, direction=None):
+        with self._refresh_lock:
+            added, removed = self.update_monitors(self.connection.get_outputs())
+
+            # Sway also emits output events for our own changes, only act on hotplugs
+            if len(added) == 0 and len(removed) == 0:
+                return None
+
+            logger.info('Monitors changed: {:n} added, {:n} removed'.format(len(added), len(removed)))
+            return self.apply_profiles(profiles, direction)
+
+    def watch(self, profiles, direction=None, debounce=None):
+        from .reconcile import Reconciler
+        reconciler = Reconciler(self, profiles, direction, debounce)
+        reconciler.reconcile()
+        reconciler.start()
+        logger.info('Watching for output events')
+        self.connection.main()
+
+    @operation('disable_all_monitors')
+    def disable_all_monitors(self):
+        # Bad idea, sway does not like it if you have no monitors enabled
+        for monitor in self.get_active_monitors():
+            monitor.disable()
+
+
+    # Private
+    def _replay_command(self, layout):
+        # The full layout and not what was sent, with diff that can be nothing at all.
+        # Disable every other output, the replayed command should not depend on what was active before
+        monitors = [placement.monitor for placement in layout]
+        commands = [monitor.build_command(['disable']) for monitor in self.monitors if monitor not in monitors]
+        commands.extend(placement.monitor.build_command(placement.get_actions()) for placement in layout)
+        return '; '.join(commands)
+
+    def _resolve_enable(self, monitors, direction, policies=None, fetch=True):
+        direction = self._direction(direction)
+        monitors = [self.find_monitor(props) for props in monitors]
+        self.resolve_modes(monitors, fetch)
+        return monitors, self._layout(monitors, direction, policies)
+
+    def _resolve_arrange(self, entries, fetch=True):
+        entries = [dict(entry, monitor=self.find_monitor(entry['monitor'])) for entry in entries]
+        monitors = [entry['monitor'] for entry in entries]
+        self.resolve_modes(monitors, fetch)
+        from .layout import LayoutEngine
+        return monitors, LayoutEngine().solve(entries)
+
+    def _run(self, monitors, layout, background, transaction, workspaces=None):
+        self.last_layout = layout
+        if transaction:
+            with self.transaction() as transaction:
+                self._apply(monitors, layout, background)
+                commands = self._workspace_commands(workspaces, monitors)
+                if len(commands) > 0:
+                    transaction.command('; '.join(commands))
+            return
+
+        # Without a transaction a failure halfway leaves a partial layout, put back what was there
+        snapshot = self.snapshot()
+        try:
+            self._apply(monitors, layout, background)
+            commands = self._workspace_commands(workspaces, monitors)
+            if len(commands) > 0:
+                self._check_workspaces(commands, self.connection.command('; '.join(commands)))
+        except Exception:
+            self.restore(snapshot)
+            raise
+
+    def _workspace_commands(self, workspaces, monitors):
+        # No rule might resolve, an empty command would still be a round trip or an empty sub-command
+        if not workspaces:
+            return []
+
+        return self.plan_workspaces(workspaces, monitors)
+
+    def _apply(self, monitors, layout, background=None):
+        logger.info('Enabling {:n} monitors'.format(len(monitors)))
+        for monitor, actions in self._plan(monitors, layout, background):
+            monitor.perform(actions)
+
+    def _set_backgrounds(self, backgrounds, sizing):
+        for monitor, path in backgrounds:
+            monitor.perform(monitor.background_actions(path, sizing))
+
+    def _layout(self, monitors, direction, policies=None):
+        if direction in ['up', 'left']:
+            monitors = list(reversed(monitors))
+
+        if policies is None:
+            policies = self.mode_policies
+
+        if policies is not None:
+            # A policy can settle on a lower refresh rate at the same resolution, the command has to say so
+            return self._place(monitors, self.select_modes(monitors, policies), direction, True)
+
+        return self._place(monitors, [monitor.get_highest_mode() for monitor in monitors], direction)
+
+
+class MonitorIndex:
+    PROPERTIES = ('name', 'make', 'model', 'serial')
+
+    def __init__(self, properties=None):
+        if properties is None:
+            properties = self.PROPERTIES
+
+        self.properties = tuple(properties)
+        self.index = {prop: {} for prop in self.properties}
+        self.entries = {}
+
+    # Actions
+    def rebuild(self, monitors):
+        self.index = {prop: {} for prop in self.properties}
+        self.entries = {}
+        for monitor in monitors:
+            self.add(monitor)
+
+    def add(self, monitor):
+        values = {prop: monitor.meta_data.get(prop) for prop in self.properties}
+        for prop, value in values.items():
+            self.index[prop].setdefault(value, set()).add(monitor)
+
+        self.entries[monitor] = values
+
+    def remove(self, monitor):
+        values = self.entries.pop(monitor, None)
+        if values is None:
+            return
+
+        for prop, value in values.items():
+            bucket = self.index[prop][value]
+            bucket.discard(monitor)
+            if len(bucket) == 0:
+                del self.index[prop][value]
+
+    def reindex(self, monitor):
+        values = {prop: monitor.meta_data.get(prop) for prop in self.properties}
+        if self.entries.get(monitor) == values:
+            return
+
+        self.remove(monitor)
+        self.add(monitor)
+
+    # Getters
+    def lookup(self, properties):
+        # Returns the candidates matching the indexed properties (None when nothing was indexed)
+        # and the properties that still have to be checked on the monitors themselves
+        candidates = None
+        remaining = {}
+        for prop, value in properties.items():
+            if prop not in self.index:
+                remaining[prop] = value
+                continue
+
+            try:
+                matches = self.index[prop].get(value, set())
+            except TypeError:
+                remaining[prop] = value
+                continue
+
+            candidates = set(matches) if candidates is None else candidates & matches
+            if len(candidates) == 0:
+                break
+
+        return candidates, remaining
+
+
+class Transaction:
+    def __init__(self, connection, rollback=None):
+        self.connection = connection
+        self.rollback_commands = rollback if rollback is not None else []
+        self.commands = []
+
+    # Actions
+    def command(self, command):
+        parts = _split_commands(command)
+        self.commands.extend(part.strip() for part in parts)
+        return [{'success': True} for _ in parts]
+
+    def commit(self):
+        if len(self.commands) == 0:
+            return []
+
+        logger.info('Committing {:n} output commands'.format(len(self.commands)))
+        try:
+            res = self.connection.command('; '.join(self.commands))
+        except Exception as e:
+            # Timed out or lost the connection, we can not tell how much was applied
+            logger.error('Committing failed: {:s}'.format(str(e)))
+            self.rollback()
+            raise CommandError('Committing {:n} commands failed'.format(len(self.commands))) from e
+
+        failed = self.get_failed(res)
+        if len(failed) == 0:
+            return res
+
+        logger.error('Failed commands: {:s}'.format(', '.join(failed)))
+        self.rollback()
+        raise CommandError('{:n} of {:n} commands failed'.format(len(failed), len(self.commands)), failed=failed)
+
+    def rollback(self):
+        if len(self.rollback_commands) == 0:
+            return
+
+        logger.warning('Rolling back to the previous layout')
+        self.connection.command('; '.join(self.rollback_commands))
+
+    # Getters
+    def get_outputs(self):
+        return self.connection.get_outputs()
+
+    def get_workspaces(self):
+        return self.connection.get_workspaces()
+
+    def get_failed(self, res):
+        return [command for command, reply in zip(self.commands, res) if reply['success'] == False]
+
+
+def _quote(name):
+    return '"{:s}"'.format(name.replace('\\', '\\\\').replace('"', '\\"'))
+
+
+def _split_commands(payload):
+    # Sway does not split inside quotes, a quoted workspace name can contain a ;
+    parts = []
+    start = 0
+    quote = None
+    escaped = False
+    for i, char in enumerate(payload):
+        if escaped:
+            escaped = False
+        elif char == '\\':
+            escaped = True
+        elif quote is not None:
+            if char == quote:
+                quote = None
+        elif char in '"\'':
+            quote = char
+        elif char == ';':
+            parts.append(payload[start:i])
+            start = i + 1
+
+    parts.append(payload[start:])
+    return parts
+
+
 # Abstract to different module
 class AmbigiousMonitorError(Exception):
     pass
@@ -324,4 +1077,7 @@ class MonitorModeNotFoundError(Exception):
 
 
 class CommandError(Exception):
-    pass
+    def __init__(self, *args, failed=None):
+        super().__init__(*args)
+        # The sub-commands sway rejected, empty when it is not known which ones
+        self.failed = list(failed or [])
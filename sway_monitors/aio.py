@@ -0,0 +1,271 @@
+import asyncio
+import contextlib
+
+from . import BaseSetup, CommandError, Monitor, MonitorModeNotFoundError, Transaction, logger
+
+__all__ = ['AsyncMonitor', 'AsyncSetup', 'AsyncTransaction']
+
+
+def _reply_data(reply):
+    # i3ipc.aio wraps the raw replies in objects, the raw data is kept in ipc_data
+    return getattr(reply, 'ipc_data', reply)
+
+
+class AsyncMonitor(Monitor):
+    # Actions
+    async def enable(self, pos=None, mode=None, background=None):
+        if pos is not None and mode is None:
+            mode = await self.get_highest_mode()
+
+        await self.perform(self.enable_actions(pos, mode, background))
+
+    async def disable(self):
+        await self.perform(['disable'])
+
+    async def background(self, path, sizing=None):
+        await self.perform(self.background_actions(path, sizing))
+
+    async def refresh_modes(self, identifier=None):
+        if identifier is None:
+            identifier = 'name'
+
+        data = [_reply_data(output) for output in await self.connection.get_outputs()]
+        self._refresh_modes_from(data, identifier)
+
+    async def perform(self, actions):
+        res = await self.connection.command(self.build_command(actions))
+        reply = _reply_data(res[0])
+        if reply['success'] == False:
+            raise CommandError('Command failed: {:s}'.format(reply.get('error', 'unknown error')), failed=[self.build_command(actions)])
+
+        self._track_background(actions)
+
+    # Getters
+    async def get_highest_mode(self):
+        # Enabling the output to read its modes is up to AsyncSetup.resolve_modes, it does all of them in one go
+        if not self.has_modes():
+            raise MonitorModeNotFoundError('Modes of {:s} are not known'.format(self.name))
+
+        return self._highest_mode()
+
+
+class AsyncSetup(BaseSetup):
+    # Only shares the planning with Setup, every call to sway is awaited here
+    monitor_class = AsyncMonitor
+
+    def __init__(self, connection, mode_cache=None, wallpaper_cache=None, diff=False):
+        super().__init__(connection, mode_cache, wallpaper_cache, diff)
+
+    @classmethod
+    async def create(cls, fetch=True, connection=None, mode_cache=None, wallpaper_cache=None, diff=False):
+        if connection is None:
+            from i3ipc.aio import Connection
+            connection = await Connection().connect()
+
+        setup = cls(connection, mode_cache, wallpaper_cache, diff)
+        if fetch:
+            await setup.fetch_monitors()
+
+        return setup
+
+    # Actions
+    async def fetch_monitors(self):
+        self.load_monitors([_reply_data(output) for output in await self.connection.get_outputs()])
+
+    async def enable(self, monitors, direction=None, background=None, transaction=False, workspaces=None):
+        monitors, layout = await self._resolve_enable(monitors, direction)
+        await self._run(monitors, layout, background, transaction, workspaces)
+
+    async def arrange(self, entries, background=None, transaction=True, workspaces=None):
+        monitors, layout = await self._resolve_arrange(entries)
+        await self._run(monitors, layout, background, transaction, workspaces)
+        return layout
+
+    async def plan(self, monitors, direction=None, background=None):
+        monitors, layout = await self._resolve_enable(monitors, direction, fetch=False)
+        return self._commands(self._plan(monitors, layout, backgrounds=await self._layout_backgrounds_async(layout, background, False)))
+
+    async def plan_layout(self, entries, background=None):
+        monitors, layout = await self._resolve_arrange(entries, fetch=False)
+        return self._commands(self._plan(monitors, layout, backgrounds=await self._layout_backgrounds_async(layout, background, False)))
+
+    async def plan_workspaces(self, rules, monitors=None):
+        if monitors is None:
+            monitors = list(self.get_active_monitors())
+
+        return self._workspace_plan(rules, monitors, await self.connection.get_workspaces())
+
+    async def plan_profiles(self, profiles, direction=None):
+        match = self.match_profiles(profiles)
+        if not match:
+            return None, []
+
+        profile = match.profile
+        if profile.has_layout():
+            return profile.name, await self.plan_layout(profile.get_layout())
+
+        return profile.name, await self.plan(profile.monitors, profile.direction or direction)
+
+    async def apply_profiles(self, profiles, direction=None):
+        profiles = self._profile_set(profiles)
+
+        match = self.match_profiles(profiles)
+        if not match:
+            logger.warning('None of the {:n} profiles match the connected monitors'.format(len(profiles)))
+            return None
+
+        profile = match.profile
+        logger.info('Applying profile {:s}'.format(profile.name))
+        if profile.has_layout():
+            await self.arrange(profile.get_layout(), workspaces=profile.workspaces)
+        else:
+            await self.enable(profile.monitors, profile.direction or direction, transaction=True, workspaces=profile.workspaces)
+
+        return profile.name
+
+    async def resolve_modes(self, monitors, fetch=True):
+        stale = self._stale(monitors, fetch)
+        if len(stale) == 0:
+            return
+
+        logger.info('Fetching modes for {:n} monitors'.format(len(stale)))
+        await asyncio.gather(*[monitor.enable() for monitor in stale if not monitor.is_active()])
+
+        data = [_reply_data(output) for output in await self.connection.get_outputs()]
+        for monitor in stale:
+            monitor._refresh_modes_from(data, 'name')
+
+        if self.mode_cache is not None:
+            self.mode_cache.update(stale)
+
+    async def restore(self, snapshot):
+        logger.warning('Restoring {:n} outputs from snapshot'.format(len(snapshot)))
+        self._restored(snapshot, [_reply_data(reply) for reply in await self.connection.command(snapshot.get_command())])
+
+    async def background(self, path, sizing=None):
+        # Scaling is blocking work, keep it off the event loop
+        backgrounds = await asyncio.get_running_loop().run_in_executor(None, self._prepare_backgrounds, path, sizing)
+        await asyncio.gather(*[monitor.background(background, sizing) for monitor, background in backgrounds])
+
+    async def disable_all_monitors(self):
+        await asyncio.gather(*[monitor.disable() for monitor in self.get_active_monitors()])
+
+    @contextlib.asynccontextmanager
+    async def transaction(self):
+        transaction = AsyncTransaction(self.connection, self.get_layout_commands())
+        connections = [(monitor, monitor.connection) for monitor in self.monitors]
+        for monitor in self.monitors:
+            monitor.connection = transaction
+
+        try:
+            yield transaction
+        finally:
+            for monitor, connection in connections:
+                monitor.connection = connection
+
+        await transaction.commit()
+
+    # Private
+    async def _resolve_enable(self, monitors, direction, fetch=True):
+        direction = self._direction(direction)
+        monitors = [self.find_monitor(props) for props in monitors]
+        await self.resolve_modes(monitors, fetch)
+        return monitors, await self._layout(monitors, direction)
+
+    async def _resolve_arrange(self, entries, fetch=True):
+        entries = [dict(entry, monitor=self.find_monitor(entry['monitor'])) for entry in entries]
+        monitors = [entry['monitor'] for entry in entries]
+        await self.resolve_modes(monitors, fetch)
+        from .layout import LayoutEngine
+        return monitors, LayoutEngine().solve(entries)
+
+    async def _run(self, monitors, layout, background, transaction, workspaces=None):
+        if transaction:
+            async with self.transaction() as transaction:
+                await self._apply(monitors, layout, background)
+                commands = await self._workspace_commands(workspaces, monitors)
+                if len(commands) > 0:
+                    await transaction.command('; '.join(commands))
+            return
+
+        # Without a transaction a failure halfway leaves a partial layout, put back what was there
+        snapshot = self.snapshot()
+        try:
+            await self._apply(monitors, layout, background)
+            commands = await self._workspace_commands(workspaces, monitors)
+            if len(commands) > 0:
+                self._check_workspaces(commands, [_reply_data(reply) for reply in await self.connection.command('; '.join(commands))])
+        except Exception:
+            await self.restore(snapshot)
+            raise
+
+    async def _workspace_commands(self, workspaces, monitors):
+        if not workspaces:
+            return []
+
+        return await self.plan_workspaces(workspaces, monitors)
+
+    async def _apply(self, monitors, layout, background=None):
+        plan = self._plan(monitors, layout, backgrounds=await self._layout_backgrounds_async(layout, background))
+
+        # Disable monitors we are not going to use in the new setup first
+        await asyncio.gather(*[monitor.perform(actions) for monitor, actions in plan if actions == ['disable']])
+
+        logger.info('Enabling {:n} monitors'.format(len(monitors)))
+        await asyncio.gather(*[monitor.perform(actions) for monitor, actions in plan if actions != ['disable']])
+
+    async def _layout_backgrounds_async(self, layout, background, prepare=True):
+        if not background or self.wallpaper_cache is None:
+            return [background] * len(layout)
+
+        # Scaling and hashing the image are blocking work, keep them off the event loop
+        return await asyncio.get_running_loop().run_in_executor(None, self._layout_backgrounds, layout, background, prepare)
+
+    async def _layout(self, monitors, direction):
+        if direction in ['up', 'left']:
+            monitors = list(reversed(monitors))
+
+        if self.mode_policies is not None:
+            return self._place(monitors, self.select_modes(monitors), direction, True)
+
+        modes = await asyncio.gather(*[monitor.get_highest_mode() for monitor in monitors])
+        return self._place(monitors, modes, direction)
+
+
+class AsyncTransaction(Transaction):
+    # Actions
+    async def command(self, command):
+        return super().command(command)
+
+    async def commit(self):
+        if len(self.commands) == 0:
+            return []
+
+        logger.info('Committing {:n} output commands'.format(len(self.commands)))
+        try:
+            res = [_reply_data(reply) for reply in await self.connection.command('; '.join(self.commands))]
+        except Exception as e:
+            logger.error('Committing failed: {:s}'.format(str(e)))
+            await self.rollback()
+            raise CommandError('Committing {:n} commands failed'.format(len(self.commands))) from e
+        failed = self.get_failed(res)
+        if len(failed) == 0:
+            return res
+
+        logger.error('Failed commands: {:s}'.format(', '.join(failed)))
+        await self.rollback()
+        raise CommandError('{:n} of {:n} commands failed'.format(len(failed), len(self.commands)), failed=failed)
+
+    async def rollback(self):
+        if len(self.rollback_commands) == 0:
+            return
+
+        logger.warning('Rolling back to the previous layout')
+        await self.connection.command('; '.join(self.rollback_commands))
+
+    # Getters
+    async def get_outputs(self):
+        return await self.connection.get_outputs()
+
+    async def get_workspaces(self):
+        return await self.connection.get_workspaces()
@@ -0,0 +1,186 @@
+import json
+import logging
+import os
+
+__all__ = ['BandwidthCache', 'LayoutCache', 'ModeCache']
+
+logger = logging.getLogger(__name__)
+
+
+def default_path(filename):
+    cache_home = os.environ.get('XDG_CACHE_HOME', os.path.expanduser('~/.cache'))
+    return os.path.join(cache_home, 'sway_monitors', filename)
+
+
+def _read_json(path, default):
+    try:
+        with open(path) as f:
+            return json.loads(f.read())
+    except (OSError, ValueError):
+        logger.warning('Could not read cache {:s}'.format(path))
+        return default
+
+
+def _write_json(path, data):
+    # Write to a temporary file first, a crash halfway should not leave a corrupt cache
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = '{:s}.tmp'.format(path)
+    with open(tmp_path, 'w') as f:
+        f.write(json.dumps(data))
+
+    os.replace(tmp_path, path)
+
+
+class ModeCache:
+    def __init__(self, path=None):
+        self.path = path
+        self.modes = {}
+        if path is not None and os.path.exists(path):
+            self.load()
+
+    @staticmethod
+    def default_path():
+        return default_path('modes.json')
+
+    # Actions
+    def load(self):
+        self.modes = _read_json(self.path, {})
+
+    def save(self):
+        if self.path is None:
+            return
+
+        _write_json(self.path, self.modes)
+
+    def update(self, monitors):
+        changed = False
+        for monitor in monitors:
+            if not monitor.has_modes():
+                continue
+
+            key = self.get_key(monitor)
+            modes = monitor.get_mode_properties()
+            if self.modes.get(key) != modes:
+                self.modes[key] = modes
+                changed = True
+
+        if changed:
+            self.save()
+
+        return changed
+
+    def apply(self, monitor):
+        modes = self.get(monitor)
+        if modes is None:
+            return False
+
+        monitor._set_modes(modes)
+        return True
+
+    # Getters
+    def get(self, monitor):
+        return self.modes.get(self.get_key(monitor))
+
+    def get_key(self, monitor):
+        return '|'.join(str(part) for part in monitor.get_identifier())
+
+
+class BandwidthCache:
+    # Highest pixel clock (pixels per second) a set of monitors was found to work with, per dock
+    def __init__(self, path=None):
+        self.path = path
+        self.limits = {}
+        if path is not None and os.path.exists(path):
+            self.load()
+
+    @staticmethod
+    def default_path():
+        return default_path('bandwidth.json')
+
+    # Actions
+    def load(self):
+        self.limits = _read_json(self.path, {})
+
+    def save(self):
+        if self.path is None:
+            return
+
+        _write_json(self.path, self.limits)
+
+    def store(self, key, limit):
+        self.limits[key] = limit
+        self.save()
+
+    # Getters
+    def get(self, key):
+        return self.limits.get(key)
+
+
+class LayoutCache:
+    def __init__(self, path=None, source=None):
+        self.path = path
+        self.source = source
+        self.source_mtime = self.get_source_mtime()
+        self.layouts = {}
+        if path is not None and os.path.exists(path):
+            self.load()
+
+    @staticmethod
+    def default_path():
+        return default_path('layouts.json')
+
+    @staticmethod
+    def fingerprint(outputs):
+        # Commands address outputs by name, so the connector is part of the fingerprint as well
+        return '\n'.join(sorted('|'.join(str(output.get(prop)) for prop in ('name', 'make', 'model', 'serial')) for output in outputs))
+
+    # Actions
+    def load(self):
+        data = _read_json(self.path, {})
+        if data.get('source_mtime') != self.source_mtime:
+            logger.info('Profiles changed, dropping cached layouts')
+            self.layouts = {}
+            return
+
+        self.layouts = data.get('layouts', {})
+
+    def save(self):
+        if self.path is None:
+            return
+
+        _write_json(self.path, {'source_mtime': self.source_mtime, 'layouts': self.layouts})
+
+    def store(self, fingerprint, profile, command):
+        entry = {'profile': profile, 'command': command}
+        if self.layouts.get(fingerprint) == entry:
+            return
+
+        self.layouts[fingerprint] = entry
+        self.save()
+
+    def invalidate(self, fingerprint=None):
+        if fingerprint is None:
+            self.layouts = {}
+        else:
+            self.layouts.pop(fingerprint, None)
+
+        self.save()
+
+    # Getters
+    def get(self, fingerprint):
+        source_mtime = self.get_source_mtime()
+        if source_mtime != self.source_mtime:
+            logger.info('Profiles changed, dropping cached layouts')
+            self.source_mtime = source_mtime
+            self.invalidate()
+
+        return self.layouts.get(fingerprint)
+
+    def get_source_mtime(self):
+        if self.source is None:
+            return None
+
+        try:
+            return os.stat(self.source).st_mtime
+        except OSError:
+            return None
@@ -0,0 +1,204 @@
+import argparse
+import logging
+import os
+import subprocess
+import sys
+import time
+
+__all__ = ['apply', 'default_profiles_path', 'dry_run', 'fallback', 'main', 'print_timings', 'profile_startup']
+
+logger = logging.getLogger(__name__)
+
+LOG_FORMAT = '%(asctime)s %(module)s %(levelname)s %(message)s'
+
+# Outputs built into laptops, used when no profile matches and no fallback was given
+INTERNAL_OUTPUTS = ('eDP', 'LVDS', 'DSI')
+
+IMPORT_PROBE = 'import time; start = time.perf_counter(); import sway_monitors; print(time.perf_counter() - start)'
+
+
+def profile_startup(connection=None):
+    timings = []
+
+    # Importing is measured in a fresh interpreter, here the package is already loaded
+    output = subprocess.run([sys.executable, '-c', IMPORT_PROBE], stdout=subprocess.PIPE, check=True)
+    timings.append(('import sway_monitors', float(output.stdout)))
+
+    if connection is None:
+        # The same client the rest of the command line uses, i3ipc when it is installed and the built in one otherwise
+        from . import _connect
+        start = time.perf_counter()
+        connection = _connect()
+        timings.append(('connect {:s}'.format(type(connection).__name__), time.perf_counter() - start))
+
+    start = time.perf_counter()
+    connection.get_outputs()
+    timings.append(('first get_outputs', time.perf_counter() - start))
+
+    return timings
+
+
+def default_profiles_path():
+    config_home = os.environ.get('XDG_CONFIG_HOME', os.path.expanduser('~/.config'))
+    return os.path.join(config_home, 'sway_monitors', 'profiles.json')
+
+
+def fallback(setup, name=None):
+    # One known good output is better than a half applied layout or no output at all
+    if name is None:
+        name = _fallback_name(setup)
+
+    if name is None:
+        return None
+
+    from . import CommandError
+    logger.warning('Falling back to {:s}'.format(name))
+    try:
+        setup.enable([{'name': name}], transaction=True)
+    except CommandError:
+        logger.exception('Falling back to {:s} failed, the previous layout was restored'.format(name))
+        return None
+
+    return name
+
+
+def apply(setup, profiles, args):
+    from . import CommandError
+    try:
+        if setup.apply_profiles(profiles, args.direction) is not None:
+            return 0
+    except CommandError:
+        logger.exception('Applying the profile failed, the previous layout was restored')
+
+    fallback(setup, args.fallback)
+    return 1
+
+
+def dry_run(setup, profiles, args):
+    from . import MonitorModeNotFoundError
+    try:
+        name, commands = setup.plan_profiles(profiles, args.direction)
+        if name is None:
+            name = args.fallback or _fallback_name(setup)
+            print('# No profile matches, falling back to {:s}'.format(name or 'nothing'))
+            for command in setup.plan([{'name': name}]) if name else []:
+                print(command)
+
+            return 1
+    except MonitorModeNotFoundError as e:
+        print('# {:s}'.format(str(e)))
+        return 1
+
+    print('# Profile {:s}'.format(name))
+    for command in commands:
+        print(command)
+
+    return 0
+
+
+def print_timings(metrics, total):
+    print('{:<24s} {:>6s} {:>10s} {:>10s}'.format('operation', 'ipc', 'ipc ms', 'total ms'))
+    for name, entry in sorted(metrics.get_summary().items(), key=lambda item: str(item[0])):
+        print('{:<24s} {:>6n} {:>10.2f} {:>10.2f}'.format(name or '-', entry['round_trips'], entry['ipc_seconds'] * 1000, entry['seconds'] * 1000))
+
+    print('{:<24s} {:>6s} {:>10s} {:>10.2f}'.format('total', '', '', total * 1000))
+
+
+def main(argv=None, connection=None):
+    parser = argparse.ArgumentParser(prog='sway-monitors', description='Configure sway outputs')
+    parser.add_argument('profiles', nargs='?', help='Profiles file, defaults to $XDG_CONFIG_HOME/sway_monitors/profiles.json')
+    parser.add_argument('-v', '--verbose', action='store_true', help='Log debug output')
+    parser.add_argument('-d', '--direction', choices=['right', 'left', 'down', 'up'], help='Direction for profiles without one')
+    parser.add_argument('--fallback', metavar='OUTPUT', help='Output to enable when no profile matches')
+    parser.add_argument('--dry-run', action='store_true', help='Print the commands instead of running them')
+    parser.add_argument('--watch', action='store_true', help='Stay running and apply profiles on output changes')
+    parser.add_argument('--timings', action='store_true', help='Report IPC round trips and time per operation')
+    parser.add_argument('--no-cache', action='store_true', help='Do not use or update the layout and mode caches')
+    parser.add_argument('--record', metavar='PATH', help='Append every IPC call and reply to a JSON-lines file')
+    parser.add_argument('--replay', metavar='PATH', help='Answer IPC calls from a recording instead of sway')
+    parser.add_argument('--replay-speed', type=float, metavar='FACTOR', help='Replay with the recorded latencies divided by FACTOR, instantly when omitted')
+    parser.add_argument('--profile-startup', action='store_true', help='Report import and first IPC time')
+    args = parser.parse_args(argv)
+
+    # The library itself does not configure logging, only the command line does
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.INFO, format=LOG_FORMAT)
+
+    if args.profile_startup:
+        for name, seconds in profile_startup(connection):
+            print('{:<24s} {:>8.2f} ms'.format(name, seconds * 1000))
+
+        return 0
+
+    if args.dry_run and args.watch:
+        parser.error('--dry-run can not be combined with --watch')
+
+    if args.replay_speed is not None and not args.replay:
+        parser.error('--replay-speed needs --replay')
+
+    start = time.perf_counter()
+    from . import Setup
+    from .instrument import InstrumentedConnection, Metrics
+    from .profiles import ProfileSet
+
+    path = args.profiles or default_profiles_path()
+    try:
+        profiles = ProfileSet.load(path)
+    except (OSError, ValueError) as e:
+        parser.error('Could not read profiles: {:s}'.format(str(e)))
+
+    metrics = Metrics()
+    if args.replay:
+        from .record import ReplayConnection
+        connection = ReplayConnection(args.replay, args.replay_speed)
+
+    if connection is None:
+        from . import _connect
+        connection = _connect()
+
+    if args.record:
+        from .record import RecordingConnection
+        connection = RecordingConnection(connection, args.record)
+
+    if args.timings:
+        connection = InstrumentedConnection(connection, [metrics])
+
+    # A replay answers for the recorded hardware, the caches belong to this machine
+    mode_cache = layout_cache = None
+    if not args.no_cache and not args.replay:
+        # A dry run can not enable outputs to ask for their modes, the cached ones are all it has
+        from .cache import LayoutCache, ModeCache
+        mode_cache = ModeCache(ModeCache.default_path())
+        if not args.dry_run:
+            layout_cache = LayoutCache(LayoutCache.default_path(), path)
+
+    setup = Setup(fetch=False, connection=connection, mode_cache=mode_cache, layout_cache=layout_cache)
+    setup.cache_outputs()
+    try:
+        if args.watch:
+            setup.fetch_monitors()
+            setup.watch(profiles, args.direction)
+            return 0
+
+        if args.dry_run:
+            setup.fetch_monitors()
+            return dry_run(setup, profiles, args)
+
+        # Cold start: the layout resolved last time for this hardware only takes one command
+        if layout_cache is not None and setup.replay_layout() is not None:
+            return 0
+
+        if setup.monitors is None:
+            setup.fetch_monitors()
+
+        return apply(setup, profiles, args)
+    finally:
+        if args.timings:
+            print_timings(metrics, time.perf_counter() - start)
+
+
+def _fallback_name(setup):
+    # Prefer the laptop panel, then whatever is lit right now
+    monitors = setup.monitors or []
+    internal = [monitor for monitor in monitors if monitor.name.startswith(INTERNAL_OUTPUTS)]
+    candidates = internal or [monitor for monitor in monitors if monitor.is_active()] or monitors
+    return candidates[0].name if len(candidates) > 0 else None
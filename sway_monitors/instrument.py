@@ -0,0 +1,211 @@
+import functools
+import json
+import logging
+import threading
+import time
+
+__all__ = ['InstrumentedConnection', 'JsonLinesSink', 'Metrics', 'operation']
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+
+def operation(name):
+    # Groups the IPC calls made inside a Setup method, a plain isinstance check when not instrumented
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(self, *args, **kwargs):
+            if not isinstance(self.connection, InstrumentedConnection):
+                return function(self, *args, **kwargs)
+
+            with self.connection.operation(name):
+                return function(self, *args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+class InstrumentedConnection:
+    def __init__(self, connection, sinks=None):
+        self.connection = connection
+        self.sinks = list(sinks or [])
+        self._local = threading.local()
+
+    # Actions
+    def command(self, payload):
+        start = time.perf_counter()
+        success = False
+        try:
+            res = self.connection.command(payload)
+            success = all(reply['success'] != False for reply in res)
+            return res
+        finally:
+            self._record('command', start, len(payload.encode()), success)
+
+    def get_outputs(self):
+        return self._query('get_outputs', self.connection.get_outputs)
+
+    def get_workspaces(self):
+        return self._query('get_workspaces', self.connection.get_workspaces)
+
+    def operation(self, name):
+        return _Operation(self, name)
+
+    def emit(self, event):
+        for sink in self.sinks:
+            try:
+                sink(event)
+            except Exception:
+                logger.exception('Instrumentation sink failed')
+
+    # Getters
+    def get_operation(self):
+        # IPC is credited to the innermost operation, the one that actually made the call
+        stack = getattr(self._local, 'stack', None)
+        return stack[-1] if stack else None
+
+    def __getattr__(self, name):
+        # Everything else (events, main loop, ...) goes straight to the real connection
+        return getattr(self.connection, name)
+
+    # Private
+    def _query(self, kind, function):
+        start = time.perf_counter()
+        success = False
+        size = 0
+        try:
+            res = function()
+            success = True
+            size = len(json.dumps([getattr(item, 'ipc_data', item) for item in res]))
+            return res
+        finally:
+            self._record(kind, start, size, success)
+
+    def _record(self, kind, start, size, success):
+        if len(self.sinks) == 0:
+            return
+
+        self.emit({
+            'type': kind,
+            'operation': self.get_operation(),
+            'payload_bytes': size,
+            'latency': time.perf_counter() - start,
+            'success': success,
+        })
+
+
+class _Operation:
+    def __init__(self, connection, name):
+        self.connection = connection
+        self.name = name
+
+    def __enter__(self):
+        local = self.connection._local
+        if not hasattr(local, 'stack'):
+            local.stack = []
+
+        local.stack.append(self.name)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        local = self.connection._local
+        local.stack.pop()
+        self.connection.emit({
+            'type': 'operation',
+            'operation': self.name,
+            'parent': local.stack[-1] if local.stack else None,
+            'latency': time.perf_counter() - self.start,
+            'success': exc_type is None,
+        })
+
+
+class JsonLinesSink:
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def __call__(self, event):
+        line = json.dumps(event, sort_keys=True)
+        with self._lock, open(self.path, 'a') as f:
+            f.write(line + '\n')
+
+
+class Metrics:
+    def __init__(self, buckets=None):
+        if buckets is None:
+            buckets = LATENCY_BUCKETS
+
+        self.buckets = tuple(buckets)
+        self.calls = {}
+        self.latencies = {}
+        self.payload_bytes = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, event):
+        with self._lock:
+            key = (event['type'], event['operation'])
+            success = 'true' if event['success'] else 'false'
+            self.calls[key + (success,)] = self.calls.get(key + (success,), 0) + 1
+            self.payload_bytes[key] = self.payload_bytes.get(key, 0) + event.get('payload_bytes', 0)
+
+            histogram = self.latencies.get(key)
+            if histogram is None:
+                histogram = self.latencies[key] = {'buckets': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+
+            for i, bound in enumerate(self.buckets):
+                if event['latency'] <= bound:
+                    histogram['buckets'][i] += 1
+
+            histogram['sum'] += event['latency']
+            histogram['count'] += 1
+
+    # Getters
+    def get_summary(self):
+        # Per operation: the IPC round trips it made itself and its wall clock time, nested operations included
+        summary = {}
+        for (kind, name), histogram in self.latencies.items():
+            entry = summary.setdefault(name, {'round_trips': 0, 'ipc_seconds': 0.0, 'seconds': 0.0})
+            if kind == 'operation':
+                entry['seconds'] += histogram['sum']
+            else:
+                entry['round_trips'] += histogram['count']
+                entry['ipc_seconds'] += histogram['sum']
+
+        return summary
+
+    def to_prometheus(self, prefix=None):
+        if prefix is None:
+            prefix = 'sway_monitors'
+
+        lines = [
+            '# HELP {:s}_ipc_calls_total IPC calls and operations by outcome'.format(prefix),
+            '# TYPE {:s}_ipc_calls_total counter'.format(prefix),
+        ]
+        for (kind, name, success), count in sorted(self.calls.items(), key=str):
+            lines.append('{:s}_ipc_calls_total{{{:s},success="{:s}"}} {:n}'.format(prefix, _labels(kind, name), success, count))
+
+        lines.append('# HELP {:s}_ipc_payload_bytes_total Bytes sent for commands and received for outputs and workspaces'.format(prefix))
+        lines.append('# TYPE {:s}_ipc_payload_bytes_total counter'.format(prefix))
+        for (kind, name), size in sorted(self.payload_bytes.items(), key=str):
+            if kind != 'operation':
+                lines.append('{:s}_ipc_payload_bytes_total{{{:s}}} {:n}'.format(prefix, _labels(kind, name), size))
+
+        lines.append('# HELP {:s}_ipc_latency_seconds Latency of IPC calls and operations'.format(prefix))
+        lines.append('# TYPE {:s}_ipc_latency_seconds histogram'.format(prefix))
+        for (kind, name), histogram in sorted(self.latencies.items(), key=str):
+            labels = _labels(kind, name)
+            for bound, count in zip(self.buckets, histogram['buckets']):
+                lines.append('{:s}_ipc_latency_seconds_bucket{{{:s},le="{:g}"}} {:n}'.format(prefix, labels, bound, count))
+
+            lines.append('{:s}_ipc_latency_seconds_bucket{{{:s},le="+Inf"}} {:n}'.format(prefix, labels, histogram['count']))
+            lines.append('{:s}_ipc_latency_seconds_sum{{{:s}}} {:f}'.format(prefix, labels, histogram['sum']))
+            lines.append('{:s}_ipc_latency_seconds_count{{{:s}}} {:n}'.format(prefix, labels, histogram['count']))
+
+        return '\n'.join(lines) + '\n'
+
+
+def _labels(kind, name):
+    return 'type="{:s}",operation="{:s}"'.format(kind, name or '')
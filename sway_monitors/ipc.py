@@ -0,0 +1,215 @@
+import json
+import logging
+import os
+import socket
+import struct
+import threading
+
+__all__ = ['SwayConnection', 'IPCError']
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'i3-ipc'
+HEADER = struct.Struct('=6sII')
+
+RUN_COMMAND = 0
+GET_WORKSPACES = 1
+SUBSCRIBE = 2
+GET_OUTPUTS = 3
+
+EVENT_MASK = 1 << 31
+EVENTS = {
+    'workspace': 0,
+    'output': 1,
+    'mode': 2,
+    'window': 3,
+    'barconfig_update': 4,
+    'binding': 5,
+    'shutdown': 6,
+    'tick': 7,
+}
+
+
+class IPCError(Exception):
+    pass
+
+
+class SwayConnection:
+    def __init__(self, socket_path=None, buffer_size=None, timeout=None):
+        if socket_path is None:
+            socket_path = os.environ.get('SWAYSOCK') or os.environ.get('I3SOCK')
+
+        if not socket_path:
+            raise IPCError('Could not find the sway socket, is SWAYSOCK set?')
+
+        if buffer_size is None:
+            buffer_size = 64 * 1024
+
+        self.socket_path = socket_path
+        # Seconds to wait for a reply, None waits forever
+        self.timeout = timeout
+        self.handlers = {}
+        self._socket = self._connect()
+        self._socket.settimeout(timeout)
+        # One receive buffer for the lifetime of the connection, it only ever grows
+        self._buffer = bytearray(buffer_size)
+        self._start = 0
+        self._end = 0
+        self._lock = threading.Lock()
+        self._event_socket = None
+
+    # Actions
+    def command(self, payload):
+        return self.request(RUN_COMMAND, payload)
+
+    def commands(self, payloads):
+        # Pipelined: every command is sent before the first reply is read
+        return self.pipeline([(RUN_COMMAND, payload) for payload in payloads])
+
+    def get_outputs(self):
+        return self.request(GET_OUTPUTS)
+
+    def get_workspaces(self):
+        return self.request(GET_WORKSPACES)
+
+    def request(self, message_type, payload=''):
+        return self.pipeline([(message_type, payload)])[0]
+
+    def pipeline(self, requests):
+        with self._lock:
+            try:
+                self._socket.sendall(b''.join(self._pack(message_type, payload) for message_type, payload in requests))
+
+                replies = []
+                while len(replies) < len(requests):
+                    message_type, data = self._receive(self._socket)
+                    if message_type & EVENT_MASK:
+                        continue
+
+                    replies.append(json.loads(data))
+            except (OSError, IPCError):
+                # Late replies would be read as the answer to the next request, start over on a new socket
+                self._reconnect()
+                raise
+
+        return replies
+
+    def on(self, event, handler):
+        self.handlers.setdefault(event.split('::')[0], []).append(handler)
+
+    def main(self):
+        # Events get their own socket, so commands can keep using the request socket from the handlers
+        self._event_socket = self._connect()
+        events = list(self.handlers)
+        self._event_socket.sendall(self._pack(SUBSCRIBE, json.dumps(events)))
+        if not json.loads(self._receive(self._event_socket, own_buffer=True)[1]).get('success'):
+            raise IPCError('Could not subscribe to {:s}'.format(', '.join(events)))
+
+        names = {code | EVENT_MASK: name for name, code in EVENTS.items()}
+        while True:
+            try:
+                message_type, data = self._receive(self._event_socket, own_buffer=True)
+            except IPCError:
+                if self._event_socket is None:
+                    return
+                raise
+
+            name = names.get(message_type)
+            event = json.loads(data)
+            for handler in self.handlers.get(name, []):
+                handler(self, event)
+
+            if name == 'shutdown':
+                return
+
+    def main_quit(self):
+        event_socket, self._event_socket = self._event_socket, None
+        if event_socket is not None:
+            event_socket.shutdown(socket.SHUT_RDWR)
+            event_socket.close()
+
+    def close(self):
+        self.main_quit()
+        self._socket.close()
+
+    # Magic
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    # Private
+    def _connect(self):
+        connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        connection.connect(self.socket_path)
+        return connection
+
+    def _reconnect(self):
+        self._socket.close()
+        self._start = 0
+        self._end = 0
+        try:
+            self._socket = self._connect()
+            self._socket.settimeout(self.timeout)
+        except OSError:
+            logger.exception('Could not reconnect to sway')
+
+    def _pack(self, message_type, payload):
+        payload = payload.encode() if isinstance(payload, str) else payload
+        return HEADER.pack(MAGIC, len(payload), message_type) + payload
+
+    def _receive(self, connection, own_buffer=False):
+        if own_buffer:
+            # The event loop runs next to requests from other threads, it can not share the request buffer
+            header = self._read_exactly(connection, HEADER.size)
+            magic, length, message_type = HEADER.unpack(header)
+            if magic != MAGIC:
+                raise IPCError('Invalid reply from sway')
+
+            return message_type, self._read_exactly(connection, length)
+
+        self._fill(connection, HEADER.size)
+        magic, length, message_type = HEADER.unpack_from(self._buffer, self._start)
+        if magic != MAGIC:
+            raise IPCError('Invalid reply from sway')
+
+        self._start += HEADER.size
+        self._fill(connection, length)
+        data = bytes(memoryview(self._buffer)[self._start:self._start + length])
+        self._start += length
+        return message_type, data
+
+    def _fill(self, connection, size):
+        # Make sure at least size unread bytes are in the buffer, pipelined replies can arrive in one read
+        if self._end - self._start >= size:
+            return
+
+        if self._start > 0:
+            remaining = self._end - self._start
+            self._buffer[:remaining] = self._buffer[self._start:self._end]
+            self._start, self._end = 0, remaining
+
+        if size > len(self._buffer):
+            self._buffer.extend(bytearray(size - len(self._buffer)))
+
+        view = memoryview(self._buffer)
+        while self._end < size:
+            received = connection.recv_into(view[self._end:])
+            if received == 0:
+                raise IPCError('Connection to sway closed')
+
+            self._end += received
+
+    def _read_exactly(self, connection, size):
+        data = bytearray(size)
+        view = memoryview(data)
+        received = 0
+        while received < size:
+            count = connection.recv_into(view[received:])
+            if count == 0:
+                raise IPCError('Connection to sway closed')
+
+            received += count
+
+        return bytes(data)
@@ -0,0 +1,229 @@
+import logging
+
+__all__ = ['LayoutEngine', 'Placement']
+
+logger = logging.getLogger(__name__)
+
+RELATIONS = ('right_of', 'left_of', 'above', 'below')
+ROTATED_TRANSFORMS = ('90', '270', 'flipped-90', 'flipped-270')
+
+
+class Placement:
+    def __init__(self, monitor, mode, pos=None, scale=None, transform=None, refresh=False):
+        if pos is None:
+            pos = (0, 0)
+
+        self.monitor = monitor
+        self.mode = mode
+        self.pos = pos
+        self.scale = scale
+        self.transform = transform
+        # Only pin the refresh rate when it was asked for, sway picks the best one otherwise
+        self.refresh = refresh
+
+    # Getters
+    def get_size(self):
+        # Without an explicit scale or transform the output keeps the one sway has for it
+        meta_data = self.monitor.meta_data
+        transform = self.transform if self.transform is not None else meta_data.get('transform')
+        scale = self.scale if self.scale is not None else meta_data.get('scale')
+
+        width, height = self.mode.get_dimensions()
+        if transform in ROTATED_TRANSFORMS:
+            width, height = height, width
+
+        # Sway positions outputs in logical pixels, disabled outputs report a scale of -1
+        if not scale or scale <= 0:
+            scale = 1
+
+        return int(round(width / scale)), int(round(height / scale))
+
+    def get_actions(self, background=None):
+        actions = [self._position_action(), self._resolution_action()]
+
+        if self.scale is not None:
+            actions.append(self._scale_action())
+
+        if self.transform is not None:
+            actions.append(self._transform_action())
+
+        if background:
+            actions.append("bg {:s} fill".format(background))
+
+        return actions
+
+    def get_changes(self, background=None):
+        # Only the actions that differ from what sway reported, every modeset blanks the screen
+        monitor = self.monitor
+        if not monitor.is_active():
+            return ["enable"] + self.get_actions(background)
+
+        actions = []
+        rect = monitor.meta_data.get('rect', {})
+        if (rect.get('x'), rect.get('y')) != tuple(self.pos):
+            actions.append(self._position_action())
+
+        active_mode = monitor.get_active_mode()
+        if active_mode is None or active_mode.get_dimensions() != self.mode.get_dimensions() \
+                or (self.refresh and active_mode.refresh != self.mode.refresh):
+            actions.append(self._resolution_action())
+
+        if self.scale is not None and monitor.meta_data.get('scale') != self.scale:
+            actions.append(self._scale_action())
+
+        if self.transform is not None and monitor.meta_data.get('transform') != self.transform:
+            actions.append(self._transform_action())
+
+        if background:
+            actions.append("bg {:s} fill".format(background))
+
+        return actions
+
+    # Private
+    def _position_action(self):
+        return "position {:n} {:n}".format(self.pos[0], self.pos[1])
+
+    def _resolution_action(self):
+        if self.refresh:
+            return "resolution {:n}x{:n}@{:.3f}Hz".format(self.mode.width, self.mode.height, self.mode.refresh / 1000)
+
+        return "resolution {:n}x{:n}".format(self.mode.width, self.mode.height)
+
+    def _scale_action(self):
+        return "scale {:g}".format(self.scale)
+
+    def _transform_action(self):
+        return "transform {:s}".format(self.transform)
+
+    # Magic
+    def __repr__(self):
+        return 'Placement({:s} {:n},{:n} {!r})'.format(self.monitor.name, self.pos[0], self.pos[1], self.mode)
+
+
+class LayoutEngine:
+    # Constraints per output (all optional except monitor):
+    #   monitor    Monitor to place
+    #   mode       MonitorMode or {'width': .., 'height': ..}, defaults to the highest mode
+    #   refresh    Preferred refresh rate in mHz
+    #   scale      Output scale
+    #   transform  Output transform, e.g. "90" or "flipped-270"
+    #   position   Absolute (x, y) position
+    #   right_of, left_of, above, below
+    #              Index of an earlier entry to place this output next to,
+    #              outputs without a position or relation continue right of the previous one
+    #   align      "top", "center" or "bottom" for right_of/left_of,
+    #              "left", "center" or "right" for above/below
+    #   offset     Extra (x, y) offset applied after placement
+
+    @staticmethod
+    def strip(monitors, modes, direction, refresh=False):
+        # refresh pins the refresh rate of the given modes, sway picks the highest one for the resolution otherwise
+        relation = 'right_of' if direction in ["right", "left"] else 'below'
+        entries = []
+        for i, (monitor, mode) in enumerate(zip(monitors, modes)):
+            entry = {'monitor': monitor, 'mode': mode}
+            if refresh:
+                entry['refresh'] = mode.refresh
+
+            if i > 0:
+                entry[relation] = i - 1
+
+            entries.append(entry)
+
+        return entries
+
+    # Actions
+    def solve(self, entries):
+        placements = []
+        for i, entry in enumerate(entries):
+            placement = Placement(
+                entry['monitor'],
+                self.select_mode(entry),
+                scale=entry.get('scale'),
+                transform=entry.get('transform'),
+                refresh=entry.get('refresh') is not None,
+            )
+            placement.pos = self._position(i, entry, placement, placements)
+            placements.append(placement)
+
+        self._normalize(placements)
+        return placements
+
+    def select_mode(self, entry):
+        monitor = entry['monitor']
+        mode = entry.get('mode')
+        refresh = entry.get('refresh')
+
+        if mode is None:
+            return monitor.select_mode(refresh=refresh)
+
+        if not isinstance(mode, dict):
+            if refresh is None or refresh == mode.refresh:
+                return mode
+
+            mode = {'width': mode.width, 'height': mode.height}
+
+        return monitor.select_mode(mode['width'], mode['height'], refresh if refresh is not None else mode.get('refresh'))
+
+    # Private
+    def _position(self, i, entry, placement, placements):
+        offset = entry.get('offset', (0, 0))
+        if 'position' in entry:
+            x, y = entry['position']
+            return x + offset[0], y + offset[1]
+
+        relations = [relation for relation in RELATIONS if relation in entry]
+        if len(relations) > 1:
+            raise ValueError('Output {:n} has more than one relative placement'.format(i))
+
+        if len(relations) == 0:
+            if i == 0:
+                return offset[0], offset[1]
+
+            relation, reference = 'right_of', i - 1
+        else:
+            relation, reference = relations[0], entry[relations[0]]
+
+        if not 0 <= reference < i:
+            raise ValueError('Output {:n} can only be placed relative to an earlier output'.format(i))
+
+        reference = placements[reference]
+        ref_x, ref_y = reference.pos
+        ref_width, ref_height = reference.get_size()
+        width, height = placement.get_size()
+
+        if relation in ['right_of', 'left_of']:
+            x = ref_x + ref_width if relation == 'right_of' else ref_x - width
+            y = self._align(entry.get('align', 'top'), ref_y, ref_height, height, ['top', 'center', 'bottom'])
+        else:
+            y = ref_y + ref_height if relation == 'below' else ref_y - height
+            x = self._align(entry.get('align', 'left'), ref_x, ref_width, width, ['left', 'center', 'right'])
+
+        return x + offset[0], y + offset[1]
+
+    def _align(self, align, start, reference_size, size, options):
+        if align not in options:
+            raise ValueError('align should be one of {:s}'.format(', '.join(options)))
+
+        if align == options[0]:
+            return start
+
+        if align == options[1]:
+            return start + (reference_size - size) // 2
+
+        return start + reference_size - size
+
+    def _normalize(self, placements):
+        # Keep the layout in positive coordinates
+        if len(placements) == 0:
+            return
+
+        min_x = min(placement.pos[0] for placement in placements)
+        min_y = min(placement.pos[1] for placement in placements)
+        if min_x >= 0 and min_y >= 0:
+            return
+
+        shift_x = min(min_x, 0)
+        shift_y = min(min_y, 0)
+        for placement in placements:
+            placement.pos = (placement.pos[0] - shift_x, placement.pos[1] - shift_y)
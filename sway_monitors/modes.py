@@ -0,0 +1,223 @@
+import logging
+from array import array
+
+__all__ = ['BandwidthCap', 'BandwidthPlanner', 'HighestMode', 'IntegerScale', 'ModeSelector', 'ModeTable', 'NativeRefresh', 'Policy']
+
+logger = logging.getLogger(__name__)
+
+
+class ModeTable:
+    # The modes of every monitor in one set of columns, row i of each column describes the same mode
+    def __init__(self, monitors):
+        self.monitors = list(monitors)
+        self.owner = array('l')
+        self.width = array('l')
+        self.height = array('l')
+        self.refresh = array('l')
+        self.offsets = []
+        for i, monitor in enumerate(self.monitors):
+            width, height, refresh = monitor.mode_columns
+            self.offsets.append(len(self.width))
+            self.owner.extend(array('l', [i]) * len(width))
+            self.width.extend(width)
+            self.height.extend(height)
+            self.refresh.extend(refresh)
+
+        self.offsets.append(len(self.width))
+
+    # Getters
+    def get_pixels(self):
+        return [width * height for width, height in zip(self.width, self.height)]
+
+    def get_pixel_clock(self):
+        # Pixels per second, refresh rates are in mHz
+        return [width * height * refresh // 1000 for width, height, refresh in zip(self.width, self.height, self.refresh)]
+
+    def get_rows(self, i):
+        return range(self.offsets[i], self.offsets[i + 1])
+
+    def get_mode(self, row):
+        monitor = self.monitors[self.owner[row]]
+        return monitor.modes[row - self.offsets[self.owner[row]]]
+
+    def __len__(self):
+        return len(self.width)
+
+
+class Policy:
+    # score() rates every row at once, None rules a row out. adjust() can change the choice over all monitors
+    def score(self, table):
+        return [0] * len(table)
+
+    def adjust(self, table, rankings, choice):
+        return choice
+
+
+class HighestMode(Policy):
+    # The default: most pixels, refresh rate breaks ties
+    def score(self, table):
+        return list(zip(table.get_pixels(), table.refresh))
+
+
+class NativeRefresh(Policy):
+    # Highest refresh rate at the largest resolution of each monitor
+    def score(self, table):
+        pixels = table.get_pixels()
+        native = [max((pixels[row] for row in table.get_rows(i)), default=0) for i in range(len(table.monitors))]
+        return [refresh if pixels[row] == native[owner] else None for row, (owner, refresh) in enumerate(zip(table.owner, table.refresh))]
+
+
+class IntegerScale(Policy):
+    # Prefer modes that are an exact multiple of the logical height, those scale without blurring
+    def __init__(self, logical_height=None):
+        if logical_height is None:
+            logical_height = 1080
+
+        self.logical_height = logical_height
+
+    def score(self, table):
+        return [1 if height % self.logical_height == 0 else 0 for height in table.height]
+
+
+class BandwidthCap(Policy):
+    # Outputs on one dock share its link, keep the summed pixel clock under limit (pixels per second)
+    def __init__(self, limit, monitors=None):
+        self.limit = limit
+        self.monitors = monitors
+
+    def adjust(self, table, rankings, choice):
+        clock = table.get_pixel_clock()
+        capped = [i for i, monitor in enumerate(table.monitors) if self.monitors is None or monitor in self.monitors]
+        positions = {i: 0 for i in capped}
+
+        while sum(clock[choice[i]] for i in capped) > self.limit:
+            # Step down the monitor that uses the most bandwidth, to its next best mode that uses less
+            steps = [(clock[choice[i]], i, self._next(clock, rankings[i], positions[i])) for i in capped]
+            steps = [step for step in steps if step[2] is not None]
+            if len(steps) == 0:
+                raise ValueError('No combination of modes fits in {:n} pixels per second'.format(self.limit))
+
+            _, i, position = max(steps)
+            positions[i] = position
+            choice[i] = rankings[i][position]
+
+        return choice
+
+    def _next(self, clock, ranking, position):
+        for next_position in range(position + 1, len(ranking)):
+            if clock[ranking[next_position]] < clock[ranking[position]]:
+                return next_position
+
+        return None
+
+
+class ModeSelector:
+    def __init__(self, policies=None):
+        if policies is None:
+            policies = [HighestMode()]
+
+        self.policies = list(policies)
+
+    # Actions
+    def select(self, monitors):
+        table = ModeTable(monitors)
+        rankings = self.rank(table)
+
+        choice = {}
+        for i, ranking in enumerate(rankings):
+            if len(ranking) == 0:
+                raise ValueError('No mode of {:s} is allowed by the policies'.format(table.monitors[i].name))
+
+            choice[i] = ranking[0]
+
+        for policy in self.policies:
+            choice = policy.adjust(table, rankings, choice)
+
+        return [table.get_mode(choice[i]) for i in range(len(table.monitors))]
+
+    def rank(self, table):
+        # Earlier policies weigh heavier, the row order (sorted modes) breaks the remaining ties
+        scores = [policy.score(table) for policy in self.policies]
+        keys = list(zip(*scores)) if len(scores) > 0 else [()] * len(table)
+
+        rankings = []
+        for i in range(len(table.monitors)):
+            rows = [row for row in table.get_rows(i) if None not in keys[row]]
+            rankings.append(sorted(rows, key=lambda row: (keys[row], row), reverse=True))
+
+        return rankings
+
+
+class BandwidthPlanner:
+    # budgets: pixels per second per output name, limit: pixels per second for all outputs together.
+    # A failed modeset lowers the limit below what was tried and is remembered for this set of monitors.
+    def __init__(self, budgets=None, limit=None, cache=None, attempts=None):
+        if budgets is None:
+            budgets = {}
+
+        if attempts is None:
+            attempts = 5
+
+        self.budgets = budgets
+        self.limit = limit
+        self.cache = cache
+        self.attempts = attempts
+
+    # Actions
+    def enable(self, setup, monitors, direction=None, background=None, workspaces=None):
+        from . import CommandError
+        from .cache import LayoutCache
+        resolved = [setup.find_monitor(props) for props in monitors]
+        key = LayoutCache.fingerprint([monitor.meta_data for monitor in resolved])
+        limit = self.get_limit(key)
+
+        error = None
+        learned = None
+        for _ in range(self.attempts):
+            # The monitors and their modes are known by now, retries do not fetch the outputs again
+            try:
+                _, layout = setup._resolve_enable(monitors, direction, self.get_policies(setup, resolved, limit))
+            except ValueError:
+                break
+
+            modes = [placement.mode for placement in layout]
+            try:
+                setup._run(resolved, layout, background, True, workspaces)
+            except CommandError as e:
+                # A bad background or workspace move does not get better with lower modes
+                if not self.is_modeset_failure(e):
+                    raise
+
+                error = e
+                learned = limit = sum(mode.get_pixel_clock() for mode in modes) - 1
+                logger.warning('Modeset failed, retrying below {:n} pixels per second'.format(limit))
+                continue
+
+            # Only remember a limit once a combination below it worked
+            if learned is not None and self.cache is not None:
+                self.cache.store(key, learned)
+
+            return modes
+
+        raise CommandError('No combination of modes could be applied', failed=error.failed if error else None) from error
+
+    # Checks
+    def is_modeset_failure(self, error):
+        # Only output commands that set a mode can be rejected for the bandwidth they need
+        return len(error.failed) > 0 and all(command.startswith('output ') and ' resolution ' in command for command in error.failed)
+
+    # Getters
+    def get_limit(self, key):
+        learned = self.cache.get(key) if self.cache is not None else None
+        limits = [limit for limit in (self.limit, learned) if limit is not None]
+        return min(limits) if len(limits) > 0 else None
+
+    def get_policies(self, setup, monitors, limit=None):
+        policies = list(setup.mode_policies or [HighestMode()])
+        for name, budget in self.budgets.items():
+            policies.append(BandwidthCap(budget, [monitor for monitor in monitors if monitor.name == name]))
+
+        if limit is not None:
+            policies.append(BandwidthCap(limit, monitors))
+
+        return policies
@@ -0,0 +1,65 @@
+import logging
+import threading
+from . import _split_commands
+
+__all__ = ['CachedConnection']
+
+logger = logging.getLogger(__name__)
+
+
+class CachedConnection:
+    # Shares one get_outputs snapshot until an output event or an output command makes it stale
+    def __init__(self, connection, subscribe=True):
+        self.connection = connection
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self._snapshot = None
+        self._lock = threading.Lock()
+        if subscribe and hasattr(connection, 'on'):
+            connection.on('output', self._on_output)
+
+    # Actions
+    def command(self, payload):
+        try:
+            return self.connection.command(payload)
+        finally:
+            if self._changes_outputs(payload):
+                self.invalidate()
+
+    def commands(self, payloads):
+        try:
+            return self.connection.commands(payloads)
+        finally:
+            if any(self._changes_outputs(payload) for payload in payloads):
+                self.invalidate()
+
+    def get_outputs(self):
+        with self._lock:
+            if self._snapshot is None:
+                self.misses += 1
+                self._snapshot = self.connection.get_outputs()
+            else:
+                self.hits += 1
+
+            snapshot = self._snapshot
+
+        # Monitors pop keys from their data, every caller gets its own top level dicts
+        return [dict(output) if isinstance(output, dict) else output for output in snapshot]
+
+    def invalidate(self):
+        with self._lock:
+            self.generation += 1
+            self._snapshot = None
+
+    # Getters
+    def __getattr__(self, name):
+        return getattr(self.connection, name)
+
+    # Private
+    def _on_output(self, connection, event):
+        logger.debug('Output event, dropping the outputs snapshot')
+        self.invalidate()
+
+    def _changes_outputs(self, payload):
+        return any(part.strip().startswith('output') for part in _split_commands(payload))
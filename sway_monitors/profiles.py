@@ -0,0 +1,135 @@
+import json
+import logging
+
+__all__ = ['Profile', 'ProfileMatch', 'ProfileSet']
+
+logger = logging.getLogger(__name__)
+
+
+def _props_key(props):
+    return tuple(sorted((prop, json.dumps(value, sort_keys=True)) for prop, value in props.items()))
+
+
+class Profile:
+    def __init__(self, name, monitors, priority=None, direction=None, workspaces=None):
+        if priority is None:
+            priority = 0
+
+        self.name = name
+        self.monitors = monitors
+        self.priority = priority
+        self.direction = direction
+        # Workspace name -> properties of the monitor it should be on
+        self.workspaces = workspaces
+
+    @classmethod
+    def from_data(cls, name, data):
+        # Either a plain list of monitor properties or an object with options
+        if isinstance(data, list):
+            return cls(name, data)
+
+        return cls(name, data['monitors'], data.get('priority'), data.get('direction'), data.get('workspaces'))
+
+    # Checks
+    def has_layout(self):
+        # Entries of the form {'monitor': {...}, 'right_of': 0, ...} are solved by the layout engine
+        return any('monitor' in entry for entry in self.monitors)
+
+    # Getters
+    def get_properties(self):
+        return [entry['monitor'] if 'monitor' in entry else entry for entry in self.monitors]
+
+    def get_layout(self):
+        return [entry if 'monitor' in entry else {'monitor': entry} for entry in self.monitors]
+
+    def __repr__(self):
+        return 'Profile({:s})'.format(self.name)
+
+
+class ProfileMatch:
+    def __init__(self, profile, failures):
+        self.profile = profile
+        self.failures = failures
+
+    def __bool__(self):
+        return self.profile is not None
+
+
+class ProfileSet:
+    def __init__(self, profiles):
+        self.profiles = list(profiles)
+        self._compile()
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(Profile.from_data(name, profile) for name, profile in data.items())
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            return cls.from_dict(json.loads(f.read()))
+
+    # Actions
+    def match(self, setup):
+        # Every distinct set of properties is only looked up once, no matter how many profiles use it
+        counts = [len(setup.find_monitors(props)) for props in self.properties]
+
+        best = None
+        failures = {}
+        for profile, keys in self._compiled:
+            reason = self._check(profile, keys, counts)
+            if reason is not None:
+                failures[profile.name] = reason
+                continue
+
+            if best is None:
+                best = profile
+            elif profile.priority > best.priority:
+                failures[best.name] = 'outranked by {:s}'.format(profile.name)
+                best = profile
+            else:
+                failures[profile.name] = 'outranked by {:s}'.format(best.name)
+
+        logger.debug('Matched profile {:s}'.format(best.name if best else 'none'))
+        return ProfileMatch(best, failures)
+
+    # Getters
+    def get(self, name):
+        for profile in self.profiles:
+            if profile.name == name:
+                return profile
+
+        return None
+
+    def __len__(self):
+        return len(self.profiles)
+
+    def __iter__(self):
+        return iter(self.profiles)
+
+    # Private
+    def _compile(self):
+        self.properties = []
+        keys = {}
+        self._compiled = []
+        for profile in self.profiles:
+            profile_keys = []
+            for props in profile.get_properties():
+                key = _props_key(props)
+                if key not in keys:
+                    keys[key] = len(self.properties)
+                    self.properties.append(props)
+
+                profile_keys.append(keys[key])
+
+            self._compiled.append((profile, profile_keys))
+
+    def _check(self, profile, keys, counts):
+        for props, key in zip(profile.get_properties(), keys):
+            if counts[key] == 0:
+                return 'no monitor matches {:s}'.format(json.dumps(props))
+
+            if counts[key] > 1:
+                return '{:n} monitors match {:s}'.format(counts[key], json.dumps(props))
+
+        return None
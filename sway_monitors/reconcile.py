@@ -0,0 +1,143 @@
+import logging
+import threading
+import time
+
+__all__ = ['Clock', 'Reconciler']
+
+logger = logging.getLogger(__name__)
+
+IDLE = 'idle'
+PENDING = 'pending'
+APPLYING = 'applying'
+
+
+class Clock:
+    # Wall clock, callbacks run on their own timer thread
+    def now(self):
+        return time.monotonic()
+
+    def call_later(self, delay, callback):
+        timer = threading.Timer(delay, callback)
+        timer.daemon = True
+        timer.start()
+        return timer
+
+
+class Reconciler:
+    # idle -> pending on an output event, every further event restarts the window
+    # pending -> applying once the window passed without events
+    # applying -> pending when events came in while applying, idle otherwise
+    def __init__(self, setup, profiles, direction=None, window=None, clock=None):
+        if window is None:
+            window = 0.2
+
+        if clock is None:
+            clock = Clock()
+
+        self.setup = setup
+        self.profiles = setup._profile_set(profiles)
+        self.direction = direction
+        self.window = window
+        self.clock = clock
+        self.state = IDLE
+        self.generation = 0
+        # Fingerprints of the outputs sway reports and the outputs the current layout was made for
+        self.observed = None
+        self.desired = None
+        # Outputs the profiles could not be applied to, not tried again until the outputs change
+        self.failed = None
+        self.applies = 0
+        self.superseded = 0
+        self._timer = None
+        self._dirty = False
+        self._lock = threading.Lock()
+
+    # Actions
+    def start(self):
+        self.setup.connection.on('output', self.on_event)
+
+    def on_event(self, connection, event):
+        self.notify()
+
+    def notify(self):
+        with self._lock:
+            self.generation += 1
+            if self.state == APPLYING:
+                # A modeset can not be interrupted halfway, look again once it is done
+                self._dirty = True
+                return
+
+            self._schedule()
+
+    def cancel(self):
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+
+            if self.state == PENDING:
+                self.state = IDLE
+
+    def reconcile(self):
+        from .cache import LayoutCache
+        data = self.setup.connection.get_outputs()
+        self.observed = LayoutCache.fingerprint(data)
+
+        # The rollback of a failed apply emits output events as well, retrying would only flicker
+        if self.observed == self.failed:
+            logger.debug('Applying failed for these outputs before, waiting for them to change')
+            return None
+
+        self.failed = None
+
+        # Sway also emits output events for our own modesets, those do not change the set of outputs
+        if self.observed == self.desired:
+            logger.debug('Outputs unchanged, nothing to apply')
+            return None
+
+        added, removed = self.setup.update_monitors(data)
+        logger.info('Monitors changed: {:n} added, {:n} removed'.format(len(added), len(removed)))
+        try:
+            name = self.setup.apply_profiles(self.profiles, self.direction)
+        except Exception:
+            self.failed = self.observed
+            raise
+
+        self.desired = self.observed
+        self.applies += 1
+        return name
+
+    # Checks
+    def is_idle(self):
+        return self.state == IDLE
+
+    # Private
+    def _schedule(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self.superseded += 1
+
+        generation = self.generation
+        self.state = PENDING
+        self._timer = self.clock.call_later(self.window, lambda: self._fire(generation))
+
+    def _fire(self, generation):
+        with self._lock:
+            # A timer that was cancelled too late still fires, only the latest one may apply
+            if generation != self.generation or self.state != PENDING:
+                return
+
+            self.state = APPLYING
+            self._timer = None
+            self._dirty = False
+
+        try:
+            self.reconcile()
+        except Exception:
+            logger.exception('Applying the profiles failed')
+        finally:
+            with self._lock:
+                if self._dirty:
+                    self._schedule()
+                else:
+                    self.state = IDLE
@@ -0,0 +1,214 @@
+import collections
+import json
+import logging
+import os
+import threading
+import time
+
+__all__ = ['RecordingConnection', 'ReplayConnection', 'ReplayError', 'read_recording']
+
+logger = logging.getLogger(__name__)
+
+RECORDED_CALLS = ('command', 'get_outputs', 'get_workspaces')
+
+
+class ReplayError(Exception):
+    pass
+
+
+def read_recording(path):
+    # Rotated files first, oldest to newest, the live file last
+    paths = []
+    backup = 1
+    while os.path.exists('{:s}.{:n}'.format(path, backup)):
+        paths.insert(0, '{:s}.{:n}'.format(path, backup))
+        backup += 1
+
+    if os.path.exists(path):
+        paths.append(path)
+
+    records = []
+    for recording in paths:
+        with open(recording) as f:
+            records.extend(json.loads(line) for line in f if line.strip())
+
+    return records
+
+
+class RecordingConnection:
+    def __init__(self, connection, path, max_bytes=None, backups=None):
+        if max_bytes is None:
+            max_bytes = 1024 * 1024
+
+        if backups is None:
+            backups = 3
+
+        self.connection = connection
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self._start = time.perf_counter()
+        self._lock = threading.Lock()
+        self._file = open(path, 'a')
+
+    # Actions
+    def command(self, payload):
+        return self._call('command', self.connection.command, payload)
+
+    def get_outputs(self):
+        return self._call('get_outputs', self.connection.get_outputs)
+
+    def get_workspaces(self):
+        return self._call('get_workspaces', self.connection.get_workspaces)
+
+    def on(self, event, handler):
+        def record(connection, data):
+            self._write({'type': 'event', 'event': event, 'time': self._now(), 'data': _raw(data)})
+            handler(connection, data)
+
+        self.connection.on(event, record)
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+        close = getattr(self.connection, 'close', None)
+        if close is not None:
+            close()
+
+    # Getters
+    def __getattr__(self, name):
+        return getattr(self.connection, name)
+
+    # Private
+    def _call(self, kind, function, *args):
+        start = time.perf_counter()
+        record = {'type': kind, 'time': start - self._start}
+        if len(args) > 0:
+            record['payload'] = args[0]
+
+        try:
+            reply = function(*args)
+            record['reply'] = _raw(reply)
+            return reply
+        except Exception as e:
+            record['error'] = str(e)
+            raise
+        finally:
+            record['latency'] = time.perf_counter() - start
+            self._write(record)
+
+    def _write(self, record):
+        line = json.dumps(record, sort_keys=True) + '\n'
+        with self._lock:
+            if self._file.tell() > 0 and self._file.tell() + len(line) > self.max_bytes:
+                self._rotate()
+
+            self._file.write(line)
+            self._file.flush()
+
+    def _rotate(self):
+        # Same scheme as logging's RotatingFileHandler: path.1 is the newest backup, the oldest one is dropped
+        self._file.close()
+        for backup in range(self.backups - 1, 0, -1):
+            source = '{:s}.{:n}'.format(self.path, backup)
+            if os.path.exists(source):
+                os.replace(source, '{:s}.{:n}'.format(self.path, backup + 1))
+
+        if self.backups > 0:
+            os.replace(self.path, '{:s}.1'.format(self.path))
+        else:
+            os.remove(self.path)
+
+        self._file = open(self.path, 'a')
+
+    def _now(self):
+        return time.perf_counter() - self._start
+
+
+class ReplayConnection:
+    # speed 1 replays the recorded latencies, 10 ten times faster, None does not wait at all
+    def __init__(self, records, speed=None, strict=False):
+        if isinstance(records, str):
+            records = read_recording(records)
+
+        self.speed = speed
+        self.strict = strict
+        self.handlers = {}
+        self.mismatches = []
+        self._calls = {kind: collections.deque() for kind in RECORDED_CALLS}
+        self._events = collections.deque()
+        for record in records:
+            if record['type'] == 'event':
+                self._events.append(record)
+            elif record['type'] in self._calls:
+                self._calls[record['type']].append(record)
+
+    # Actions
+    def command(self, payload):
+        record = self._next('command')
+        if record.get('payload') != payload:
+            if self.strict:
+                raise ReplayError('Expected {!r} but got {!r}'.format(record.get('payload'), payload))
+
+            logger.warning('Command differs from the recording: {:s}'.format(payload))
+            self.mismatches.append((record.get('payload'), payload))
+
+        return self._reply(record)
+
+    def get_outputs(self):
+        return self._reply(self._next('get_outputs'))
+
+    def get_workspaces(self):
+        return self._reply(self._next('get_workspaces'))
+
+    def on(self, event, handler):
+        self.handlers.setdefault(event, []).append(handler)
+
+    def main(self):
+        # Events are played back with their recorded spacing, the calls they trigger take the next replies
+        previous = None
+        while len(self._events) > 0:
+            record = self._events.popleft()
+            if previous is not None:
+                self._wait(record['time'] - previous)
+
+            previous = record['time']
+            for handler in self.handlers.get(record['event'], []):
+                handler(self, record['data'])
+
+    def main_quit(self):
+        self._events.clear()
+
+    def close(self):
+        self.main_quit()
+
+    # Getters
+    def get_remaining(self):
+        return {kind: len(records) for kind, records in self._calls.items()}
+
+    # Private
+    def _next(self, kind):
+        if len(self._calls[kind]) == 0:
+            raise ReplayError('The recording has no more {:s} replies'.format(kind))
+
+        return self._calls[kind].popleft()
+
+    def _reply(self, record):
+        self._wait(record.get('latency', 0))
+        if 'error' in record:
+            raise ReplayError(record['error'])
+
+        return record['reply']
+
+    def _wait(self, seconds):
+        if self.speed and seconds > 0:
+            time.sleep(seconds / self.speed)
+
+
+def _raw(data):
+    # i3ipc wraps replies in objects, keep the plain data they were made from
+    if isinstance(data, list):
+        return [_raw(item) for item in data]
+
+    return getattr(data, 'ipc_data', data)
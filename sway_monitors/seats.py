@@ -0,0 +1,146 @@
+import concurrent.futures
+import glob
+import logging
+import os
+import stat
+import time
+
+__all__ = ['Coordinator', 'InstanceResult', 'Report']
+
+logger = logging.getLogger(__name__)
+
+SOCKET_PATTERN = 'sway-ipc.*.sock'
+
+
+class InstanceResult:
+    def __init__(self, path, value=None, seconds=0.0, error=None):
+        self.path = path
+        self.value = value
+        self.seconds = seconds
+        self.error = error
+
+    # Checks
+    def is_ok(self):
+        return self.error is None
+
+    # Magic
+    def __repr__(self):
+        return 'InstanceResult({:s} {:s} {:.1f} ms)'.format(self.path, repr(self.error) if self.error else repr(self.value), self.seconds * 1000)
+
+
+class Report:
+    def __init__(self, results, seconds):
+        self.results = list(results)
+        # Wall clock time of the whole run, the instances ran next to each other
+        self.seconds = seconds
+
+    # Checks
+    def is_ok(self):
+        return all(result.is_ok() for result in self.results)
+
+    # Getters
+    def get_values(self):
+        return {result.path: result.value for result in self.results if result.is_ok()}
+
+    def get_failed(self):
+        return [result for result in self.results if not result.is_ok()]
+
+    def get_timings(self):
+        return {result.path: result.seconds for result in self.results}
+
+    def __iter__(self):
+        return iter(self.results)
+
+    def __len__(self):
+        return len(self.results)
+
+
+class Coordinator:
+    def __init__(self, setups, workers=None):
+        # Socket path -> Setup
+        self.setups = dict(setups)
+        self.workers = workers
+
+    @staticmethod
+    def discover(directory=None):
+        # Sway names its socket after the uid and pid, stale sockets of crashed sessions are left behind
+        if directory is None:
+            directory = os.environ.get('XDG_RUNTIME_DIR', '/run/user/{:n}'.format(os.getuid()))
+
+        paths = []
+        for path in sorted(glob.glob(os.path.join(directory, SOCKET_PATTERN))):
+            try:
+                if stat.S_ISSOCK(os.stat(path).st_mode):
+                    paths.append(path)
+            except OSError:
+                continue
+
+        return paths
+
+    @classmethod
+    def connect(cls, paths=None, workers=None, timeout=None, **kwargs):
+        if paths is None:
+            paths = cls.discover()
+
+        coordinator = cls({}, workers)
+        report = coordinator._map(paths, lambda path: coordinator._connect(path, timeout, kwargs))
+        for result in report.get_failed():
+            logger.warning('Skipping {:s}: {:s}'.format(result.path, str(result.error)))
+
+        coordinator.setups = report.get_values()
+        return coordinator
+
+    # Actions
+    def run(self, function):
+        return self._map(list(self.setups), lambda path: function(self.setups[path]))
+
+    def apply_profiles(self, profiles, direction=None):
+        from .profiles import ProfileSet
+        if not isinstance(profiles, ProfileSet):
+            profiles = ProfileSet.from_dict(profiles)
+
+        report = self.run(lambda setup: setup.apply_profiles(profiles, direction))
+        logger.info('Applied profiles to {:n} of {:n} sway instances in {:.1f} ms'.format(
+            len(report) - len(report.get_failed()), len(report), report.seconds * 1000))
+        return report
+
+    def close(self):
+        for setup in self.setups.values():
+            close = getattr(setup.connection, 'close', None)
+            if close is not None:
+                close()
+
+    # Magic
+    def __len__(self):
+        return len(self.setups)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    # Private
+    def _connect(self, path, timeout, kwargs):
+        from . import Setup
+        from .ipc import SwayConnection
+        return Setup(connection=SwayConnection(path, timeout=timeout), **kwargs)
+
+    def _map(self, paths, function):
+        start = time.perf_counter()
+        if len(paths) == 0:
+            return Report([], 0.0)
+
+        with concurrent.futures.ThreadPoolExecutor(self.workers or len(paths)) as executor:
+            results = list(executor.map(lambda path: self._call(path, function), paths))
+
+        return Report(results, time.perf_counter() - start)
+
+    def _call(self, path, function):
+        # One broken instance should not keep the others from being configured
+        start = time.perf_counter()
+        try:
+            return InstanceResult(path, function(path), time.perf_counter() - start)
+        except Exception as e:
+            logger.exception('Sway instance {:s} failed'.format(path))
+            return InstanceResult(path, None, time.perf_counter() - start, e)
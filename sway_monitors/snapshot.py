@@ -0,0 +1,140 @@
+import json
+import logging
+
+__all__ = ['OutputState', 'Snapshot']
+
+logger = logging.getLogger(__name__)
+
+
+class OutputState:
+    def __init__(self, name, active, mode=None, position=None, scale=None, transform=None, background=None):
+        self.name = name
+        self.active = active
+        # (width, height, refresh in mHz)
+        self.mode = tuple(mode) if mode is not None else None
+        self.position = tuple(position) if position is not None else None
+        self.scale = scale
+        self.transform = transform
+        # "path sizing" as last set through this library, sway does not report it
+        self.background = background
+
+    @classmethod
+    def from_monitor(cls, monitor):
+        if not monitor.active:
+            return cls(monitor.name, False, background=monitor.current_background)
+
+        mode = monitor.get_active_mode()
+        rect = monitor.meta_data.get('rect')
+        return cls(
+            monitor.name,
+            True,
+            (mode.width, mode.height, mode.refresh) if mode is not None else None,
+            (rect['x'], rect['y']) if rect is not None else None,
+            monitor.meta_data.get('scale'),
+            monitor.meta_data.get('transform'),
+            monitor.current_background,
+        )
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['name'], data['active'], data.get('mode'), data.get('position'), data.get('scale'), data.get('transform'), data.get('background'))
+
+    # Getters
+    def get_actions(self):
+        if not self.active:
+            return ['disable']
+
+        actions = ['enable']
+        if self.position is not None:
+            actions.append('position {:n} {:n}'.format(self.position[0], self.position[1]))
+
+        if self.mode is not None:
+            if self.mode[2]:
+                actions.append('resolution {:n}x{:n}@{:.3f}Hz'.format(self.mode[0], self.mode[1], self.mode[2] / 1000))
+            else:
+                actions.append('resolution {:n}x{:n}'.format(self.mode[0], self.mode[1]))
+
+        if self.scale is not None:
+            actions.append('scale {:g}'.format(self.scale))
+
+        if self.transform is not None:
+            actions.append('transform {:s}'.format(self.transform))
+
+        if self.background is not None:
+            actions.append('bg {:s}'.format(self.background))
+
+        return actions
+
+    def get_command(self):
+        return ' '.join(['output {:s}'.format(self.name)] + self.get_actions())
+
+    def to_dict(self):
+        return {
+            'name': self.name,
+            'active': self.active,
+            'mode': list(self.mode) if self.mode is not None else None,
+            'position': list(self.position) if self.position is not None else None,
+            'scale': self.scale,
+            'transform': self.transform,
+            'background': self.background,
+        }
+
+    # Magic
+    def __eq__(self, other):
+        if not isinstance(other, OutputState):
+            return NotImplemented
+
+        return self.to_dict() == other.to_dict()
+
+    def __repr__(self):
+        return 'OutputState({:s})'.format(self.get_command())
+
+
+class Snapshot:
+    def __init__(self, outputs):
+        self.outputs = list(outputs)
+
+    @classmethod
+    def from_monitors(cls, monitors):
+        return cls(OutputState.from_monitor(monitor) for monitor in monitors)
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(OutputState.from_dict(output) for output in data['outputs'])
+
+    @classmethod
+    def from_json(cls, data):
+        return cls.from_dict(json.loads(data))
+
+    # Getters
+    def get(self, name):
+        for output in self.outputs:
+            if output.name == name:
+                return output
+
+        return None
+
+    def get_commands(self):
+        # Enable before disabling, sway does not like it if you have no monitors enabled
+        enabled = [output.get_command() for output in self.outputs if output.active]
+        disabled = [output.get_command() for output in self.outputs if not output.active]
+        return enabled + disabled
+
+    def get_command(self):
+        return '; '.join(self.get_commands())
+
+    def to_dict(self):
+        return {'outputs': [output.to_dict() for output in self.outputs]}
+
+    def to_json(self):
+        return json.dumps(self.to_dict(), sort_keys=True)
+
+    # Magic
+    def __eq__(self, other):
+        if not isinstance(other, Snapshot):
+            return NotImplemented
+
+        return self.to_dict() == other.to_dict()
+
+    def __len__(self):
+        return len(self.outputs)
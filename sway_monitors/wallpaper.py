@@ -0,0 +1,156 @@
+import concurrent.futures
+import hashlib
+import logging
+import os
+
+from .cache import default_path
+from .layout import ROTATED_TRANSFORMS
+
+__all__ = ['WallpaperCache', 'output_size', 'scale_image']
+
+logger = logging.getLogger(__name__)
+
+# Only these modes produce an image of a known size, the others are handed to sway untouched
+SCALED_SIZINGS = ('fill', 'stretch', 'fit')
+
+
+def output_size(mode, transform=None):
+    # Wallpapers are drawn in physical pixels, so only the rotation matters and not the scale
+    width, height = mode.get_dimensions()
+    if transform in ROTATED_TRANSFORMS:
+        width, height = height, width
+
+    return width, height
+
+
+def scale_image(source, target, size, sizing):
+    try:
+        from PIL import Image, ImageOps
+    except ImportError:
+        raise ImportError('Pre-scaling wallpapers requires Pillow, install SwayMonitors[wallpaper]')
+
+    with Image.open(source) as image:
+        image = ImageOps.exif_transpose(image)
+        if sizing == 'fill':
+            image = ImageOps.fit(image, size, Image.LANCZOS)
+        elif sizing == 'fit':
+            image = ImageOps.contain(image, size, Image.LANCZOS)
+        else:
+            image = image.resize(size, Image.LANCZOS)
+
+        if image.mode not in ('RGB', 'L'):
+            image = image.convert('RGB')
+
+        # Write next to the target first, other processes might be reading the cache
+        tmp_target = '{:s}.{:n}.tmp'.format(target, os.getpid())
+        image.save(tmp_target, format='JPEG', quality=95)
+
+    os.replace(tmp_target, target)
+    return target
+
+
+class WallpaperCache:
+    def __init__(self, directory=None, max_entries=None, workers=None, scaler=None):
+        if directory is None:
+            directory = default_path('wallpapers')
+
+        if max_entries is None:
+            max_entries = 32
+
+        if scaler is None:
+            scaler = scale_image
+
+        self.directory = directory
+        self.max_entries = max_entries
+        self.workers = workers
+        self.scaler = scaler
+        self._hashes = {}
+
+    # Actions
+    def get(self, source, size, sizing=None):
+        return self.prepare(source, [size], sizing)[tuple(size)]
+
+    def prepare(self, source, sizes, sizing=None):
+        if not sizing:
+            sizing = 'fill'
+
+        paths = self.get_paths(source, sizes, sizing)
+        if sizing not in SCALED_SIZINGS:
+            return paths
+
+        source = os.path.abspath(source)
+        os.makedirs(self.directory, exist_ok=True)
+        missing = [size for size, path in paths.items() if not os.path.exists(path)]
+
+        for size, path in paths.items():
+            if size not in missing:
+                # Eviction sorts on the modification time, touching an entry marks it as recently used
+                os.utime(path)
+
+        if len(missing) > 0:
+            logger.info('Scaling {:s} to {:n} sizes'.format(os.path.basename(source), len(missing)))
+            self._scale(source, [(size, paths[size]) for size in missing], sizing)
+            self.evict()
+
+        return paths
+
+    def evict(self):
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith('.tmp'):
+                continue
+
+            path = os.path.join(self.directory, name)
+            entries.append((os.stat(path).st_mtime, path))
+
+        # Oldest modification time first, prepare() touches every entry it hands out
+        entries.sort()
+        for _, path in entries[:max(len(entries) - self.max_entries, 0)]:
+            logger.debug('Evicting {:s}'.format(path))
+            os.remove(path)
+
+    # Getters
+    def get_paths(self, source, sizes, sizing=None):
+        # Where prepare() puts the scaled images, without scaling or writing anything
+        if not sizing:
+            sizing = 'fill'
+
+        source = os.path.abspath(source)
+        if not os.path.exists(source):
+            raise FileNotFoundError('Specified background does not exists')
+
+        sizes = list(dict.fromkeys(tuple(size) for size in sizes))
+        if sizing not in SCALED_SIZINGS:
+            return {size: source for size in sizes}
+
+        return {size: self.get_path(source, size, sizing) for size in sizes}
+
+    def get_path(self, source, size, sizing):
+        return os.path.join(self.directory, '{:s}-{:n}x{:n}-{:s}.jpg'.format(self.get_hash(source), size[0], size[1], sizing))
+
+    def get_hash(self, source):
+        # Hashing a large image takes longer than the lookup, only rehash when the file changed
+        stat = os.stat(source)
+        key = (source, stat.st_mtime_ns, stat.st_size)
+        if key not in self._hashes:
+            digest = hashlib.sha1()
+            with open(source, 'rb') as f:
+                for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                    digest.update(chunk)
+
+            self._hashes[key] = digest.hexdigest()
+
+        return self._hashes[key]
+
+    # Private
+    def _scale(self, source, jobs, sizing):
+        if len(jobs) == 1 or self.workers == 1:
+            for size, path in jobs:
+                self.scaler(source, path, size, sizing)
+
+            return
+
+        with concurrent.futures.ProcessPoolExecutor(self.workers) as executor:
+            futures = [executor.submit(self.scaler, source, path, size, sizing) for size, path in jobs]
+            for future in futures:
+                future.result()
@@ -0,0 +1,37 @@
+#!/usr/bin/env python
+import asyncio
+from .FakeConnection import FakeConnection
+class AsyncFakeConnection:
+    def __init__(self, delay=0):
+        self.connection = FakeConnection()
+        self.delay = delay
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    @property
+    def command_list(self):
+        return self.connection.command_list
+
+    @property
+    def fail_on(self):
+        return self.connection.fail_on
+
+    async def command(self, command, result=None):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(self.delay)
+        self.in_flight -= 1
+
+        return self.connection.command(command, result)
+
+    def clear(self):
+        self.connection.clear()
+        self.max_in_flight = 0
+
+    async def get_outputs(self):
+        await asyncio.sleep(self.delay)
+        return self.connection.get_outputs()
+
+    async def get_workspaces(self):
+        await asyncio.sleep(self.delay)
+        return self.connection.get_workspaces()
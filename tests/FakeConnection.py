@@ -1,12 +1,18 @@
 #!/usr/bin/env python
 import json
+import os
+from sway_monitors import _split_commands
 class FakeConnection:
     def __init__(self):
         self.command_list = []
+        self.fail_on = []
+        self.outputs = None
+        self.workspaces = []
+        self.outputs_mtime = None
 
     def command(self, command, result=None):
         if result is None:
-            result = [{'success': True}]
+            result = [{'success': not any(failure in part for failure in self.fail_on)} for part in _split_commands(command)]
 
         self.command_list.append(command)
         return result
@@ -15,7 +21,15 @@ class FakeConnection:
         self.command_list = []
 
     def get_outputs(self):
-        with open('tests/setup.json') as f:
-            data = json.loads(f.read())
+        # Only parse the fixture again when it changed on disk, callers still get their own dicts
+        mtime = os.stat('tests/setup.json').st_mtime_ns
+        if mtime != self.outputs_mtime:
+            with open('tests/setup.json') as f:
+                self.outputs = json.loads(f.read())
 
-        return data
+            self.outputs_mtime = mtime
+
+        return [dict(output) for output in self.outputs]
+
+    def get_workspaces(self):
+        return [dict(workspace) for workspace in self.workspaces]
@@ -0,0 +1,112 @@
+#!/usr/bin/env python
+import json
+import os
+import socket
+import struct
+import tempfile
+import threading
+import time
+from sway_monitors import _split_commands
+
+HEADER = struct.Struct('=6sII')
+
+
+class FakeSwayServer:
+    def __init__(self, outputs_path='tests/setup.json', path=None):
+        with open(outputs_path) as f:
+            self.outputs = f.read()
+
+        self.directory = None
+        if path is None:
+            self.directory = tempfile.TemporaryDirectory()
+            path = os.path.join(self.directory.name, 'sway-ipc.sock')
+
+        self.path = path
+        self.command_list = []
+        self.requests = []
+        self.fail_on = []
+        self.delay = 0
+        self.subscribers = {}
+        self.server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.server.bind(self.path)
+        self.server.listen()
+        self.thread = threading.Thread(target=self._accept, daemon=True)
+        self.thread.start()
+
+    def emit(self, event, payload, code):
+        data = json.dumps(payload).encode()
+        for connection, events in list(self.subscribers.items()):
+            if event in events:
+                connection.sendall(HEADER.pack(b'i3-ipc', len(data), code | 1 << 31) + data)
+
+    def close(self):
+        # Closing alone does not wake up the accept() blocked on the other thread, it would keep accepting
+        try:
+            self.server.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+        self.server.close()
+        self.thread.join()
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+        if self.directory is not None:
+            self.directory.cleanup()
+
+    def _accept(self):
+        while True:
+            try:
+                connection, _ = self.server.accept()
+            except OSError:
+                return
+
+            threading.Thread(target=self._serve, args=(connection,), daemon=True).start()
+
+    def _serve(self, connection):
+        # Read with small chunks so pipelined requests are split across reads
+        buffer = b''
+        while True:
+            try:
+                data = connection.recv(7)
+            except OSError:
+                return
+
+            if not data:
+                return
+
+            buffer += data
+            while len(buffer) >= HEADER.size:
+                magic, length, message_type = HEADER.unpack_from(buffer)
+                if len(buffer) < HEADER.size + length:
+                    break
+
+                payload = buffer[HEADER.size:HEADER.size + length].decode()
+                buffer = buffer[HEADER.size + length:]
+                self.requests.append(message_type)
+                reply = self._handle(message_type, payload).encode()
+                time.sleep(self.delay)
+                try:
+                    connection.sendall(HEADER.pack(b'i3-ipc', len(reply), message_type) + reply)
+                except OSError:
+                    return
+
+                # Only send events once the subscription was acknowledged
+                if message_type == 2:
+                    self.subscribers[connection] = json.loads(payload)
+
+    def _handle(self, message_type, payload):
+        if message_type == 0:
+            self.command_list.append(payload)
+            return json.dumps([{'success': not any(failure in part for failure in self.fail_on)} for part in _split_commands(payload)])
+
+        if message_type == 2:
+            return json.dumps({'success': True})
+
+        if message_type == 3:
+            return self.outputs
+
+        if message_type == 1:
+            return json.dumps([])
+
+        return json.dumps({'success': False, 'error': 'unsupported'})
@@ -0,0 +1,42 @@
+#!/usr/bin/env python
+import heapq
+
+
+class SimulatedTimer:
+    def __init__(self, deadline, callback):
+        self.deadline = deadline
+        self.callback = callback
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class SimulatedClock:
+    # Time only moves when a test advances it, due callbacks run in order on the calling thread
+    def __init__(self):
+        self.time = 0.0
+        self.timers = []
+        self.counter = 0
+
+    def now(self):
+        return self.time
+
+    def call_later(self, delay, callback):
+        timer = SimulatedTimer(self.time + delay, callback)
+        self.counter += 1
+        heapq.heappush(self.timers, (timer.deadline, self.counter, timer))
+        return timer
+
+    def advance(self, seconds):
+        end = self.time + seconds
+        while len(self.timers) > 0 and self.timers[0][0] <= end:
+            deadline, _, timer = heapq.heappop(self.timers)
+            self.time = deadline
+            if not timer.cancelled:
+                timer.callback()
+
+        self.time = end
+
+    def pending(self):
+        return len([timer for _, _, timer in self.timers if not timer.cancelled])
@@ -0,0 +1,147 @@
+import unittest
+from sway_monitors import CommandError, MonitorModeNotFoundError, WallpaperCache
+from sway_monitors.aio import AsyncSetup, AsyncMonitor
+import shutil
+import tempfile
+import threading
+from .AsyncFakeConnection import AsyncFakeConnection
+
+
+class AsyncSetupTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.connection = AsyncFakeConnection(delay=0.001)
+        self.setup = await AsyncSetup.create(connection=self.connection)
+
+    async def test_fetch_monitors(self):
+        self.assertEqual(len(self.setup.monitors), 3)
+        self.assertIsInstance(self.setup.find_monitor({'model': 'DELL U2414H'}), AsyncMonitor)
+
+    async def test_enable(self):
+        self.connection.clear()
+
+        await self.setup.enable([
+            {'model': 'DELL U2414H'},
+            {'model':'DELL U2913WM', 'serial':'HFDVR4Z0NIRM'}
+        ])
+
+        self.assertEqual(sorted(self.connection.command_list), [
+            "output DP-3 position 0 0 resolution 1920x1080",
+            "output DP-4 position 1920 0 resolution 2560x1080",
+        ])
+        self.assertEqual(self.connection.max_in_flight, 2)
+
+    async def test_enable_transaction(self):
+        self.connection.clear()
+
+        await self.setup.enable([
+            {'model': 'DELL U2414H'}
+        ], transaction=True)
+
+        self.assertEqual(self.connection.command_list, ["output DP-4 disable; output DP-3 position 0 0 resolution 1920x1080"])
+
+    async def test_enable_transaction_rollback(self):
+        self.connection.clear()
+        self.connection.fail_on.append('DP-3 position 0 0')
+
+        with self.assertRaises(CommandError):
+            await self.setup.enable([{'model': 'DELL U2414H'}], transaction=True)
+
+        self.assertEqual(len(self.connection.command_list), 2)
+
+    async def test_enable_restore(self):
+        self.connection.clear()
+        self.connection.fail_on.append('DP-4 position')
+
+        with self.assertRaises(CommandError):
+            await self.setup.enable([{'name': 'DP-3'}, {'name': 'DP-4'}])
+
+        # Both outputs were sent at once, the snapshot puts back the one that did change
+        self.assertEqual(len(self.connection.command_list), 3)
+        self.assertTrue(self.connection.command_list[-1].startswith('output DP-3 enable'))
+
+    async def test_enable_workspaces(self):
+        self.connection.connection.workspaces = [{'name': '1', 'output': 'DP-3', 'focused': True}]
+        self.connection.clear()
+
+        await self.setup.enable([{'name': 'DP-3'}, {'name': 'DP-4'}], transaction=True, workspaces={'1': {'name': 'DP-4'}})
+
+        self.assertEqual(self.connection.command_list, ['; '.join([
+            'output DP-3 position 0 0 resolution 1920x1080',
+            'output DP-4 position 1920 0 resolution 2560x1080',
+            'workspace "1" output DP-4',
+            'workspace --no-auto-back-and-forth "1"',
+            'move workspace to output DP-4',
+            'workspace --no-auto-back-and-forth "1"',
+        ])])
+
+    async def test_apply_profiles(self):
+        self.connection.clear()
+
+        profiles = {'home': [{'model': 'DELL U2414H'}, {'model':'DELL U2913WM', 'serial':'HFDVR4Z0NIRM'}]}
+        self.assertEqual(await self.setup.apply_profiles(profiles), 'home')
+        self.assertEqual(await self.setup.plan_profiles(profiles), ('home', [
+            "output DP-3 position 0 0 resolution 1920x1080",
+            "output DP-4 position 1920 0 resolution 2560x1080",
+        ]))
+        self.assertEqual(self.connection.command_list, ["output DP-3 position 0 0 resolution 1920x1080; output DP-4 position 1920 0 resolution 2560x1080"])
+
+    async def test_no_sync_entry_points(self):
+        # Only the planning is shared with Setup, its blocking calls to sway are not
+        for name in ('refresh', 'watch', 'replay_layout', 'instrument', 'cache_outputs'):
+            self.assertFalse(hasattr(self.setup, name), name)
+
+    async def test_enable_inactive(self):
+        self.connection.clear()
+
+        monitor = self.setup.find_monitor({'serial': 'GBI2MEXRS5CD'})
+        monitor.modes = []
+
+        await self.setup.enable([{'model':'DELL U2913WM', 'serial':'GBI2MEXRS5CD'}], direction="down")
+
+        self.assertEqual(self.connection.command_list[0], "output DP-5 enable")
+        self.assertIn("output DP-5 position 0 0 resolution 2560x1080", self.connection.command_list)
+
+    async def test_enable_background_off_loop(self):
+        threads = []
+
+        def scaler(source, target, size, sizing):
+            threads.append(threading.get_ident())
+            shutil.copyfile(source, target)
+            return target
+
+        with tempfile.TemporaryDirectory() as directory:
+            self.setup.wallpaper_cache = WallpaperCache(directory, workers=1, scaler=scaler)
+            self.connection.clear()
+
+            await self.setup.enable([{'name': 'DP-3'}, {'name': 'DP-4'}], background='./tests/ExistingWallpaper.jpg')
+
+        # Scaling ran in the executor, the event loop kept going
+        self.assertEqual(len(threads), 2)
+        self.assertNotIn(threading.get_ident(), threads)
+        self.assertTrue(all('-fill.jpg fill' in command for command in self.connection.command_list))
+
+    async def test_highest_mode_unknown(self):
+        monitor = self.setup.find_monitor({'name': 'DP-5'})
+        monitor.modes = []
+        self.connection.clear()
+
+        # Reading the modes of a disabled output is left to resolve_modes, asking does not enable it
+        with self.assertRaises(MonitorModeNotFoundError):
+            await monitor.get_highest_mode()
+
+        self.assertEqual(self.connection.command_list, [])
+
+    async def test_background(self):
+        self.connection.clear()
+
+        await self.setup.background('./tests/ExistingWallpaper.jpg')
+
+        self.assertEqual(len(self.connection.command_list), 2)
+        self.assertEqual(self.connection.max_in_flight, 2)
+
+    async def test_disable(self):
+        self.connection.clear()
+
+        await self.setup.find_monitor({'name': 'DP-3'}).disable()
+
+        self.assertEqual(self.connection.command_list, ["output DP-3 disable"])
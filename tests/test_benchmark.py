@@ -0,0 +1,61 @@
+import unittest
+from sway_monitors import RecordingConnection, Setup
+import os
+import tempfile
+from benchmarks import bench_setup
+from benchmarks.simulated import SimulatedConnection
+from .FakeConnection import FakeConnection
+
+
+class SimulatedConnectionTest(unittest.TestCase):
+    def test_outputs(self):
+        connection = SimulatedConnection(outputs=16, modes=200, active=8)
+        setup = Setup(connection=connection)
+
+        self.assertEqual(len(setup.monitors), 16)
+        self.assertEqual(len(list(setup.get_active_monitors())), 8)
+        self.assertEqual(len(setup.find_monitor({'serial': 'SN0015'}).modes), 200)
+        self.assertEqual(connection.calls['get_outputs'], 1)
+
+
+class BenchmarkTest(unittest.TestCase):
+    def test_round_trips(self):
+        results = bench_setup.run([{'outputs': 4, 'modes': 20, 'profiles': 3}], repeat=1)
+
+        self.assertEqual(results['4x20/3 fetch_monitors']['round_trips'], 1)
+        self.assertEqual(results['4x20/3 check_setup']['round_trips'], 0)
+        self.assertEqual(results['4x20/3 enable']['round_trips'], 4)
+        self.assertEqual(results['4x20/3 enable_transaction']['round_trips'], 1)
+
+    def test_ratios(self):
+        results = bench_setup.run([{'outputs': 1, 'modes': 10, 'profiles': 1}], repeat=1)
+
+        self.assertGreater(results['1x10/1 fetch_monitors']['time_ratio'], 0)
+        self.assertGreater(results['1x10/1 fetch_monitors']['peak_ratio'], 0)
+
+    def test_check(self):
+        results = {'1x1/1 enable': {'time_ratio': 2, 'round_trips': 3, 'peak_ratio': 1}}
+
+        self.assertEqual(bench_setup.check(results, {'results': {'1x1/1 enable': {'time_ratio': 5, 'round_trips': 3}}}), [])
+        self.assertEqual(len(bench_setup.check(results, {'results': {'1x1/1 enable': {'round_trips': 1}}})), 1)
+        self.assertEqual(len(bench_setup.check(results, {'results': {'1x1/1 enable': {'peak_ratio': 0.5}}})), 1)
+
+    def test_check_latency(self):
+        results = {'1x1/1 enable': {'time_ratio': 20, 'round_trips': 3, 'peak_ratio': 1}}
+        thresholds = {'latency': 0, 'results': {'1x1/1 enable': {'time_ratio': 5, 'round_trips': 3}}}
+
+        self.assertEqual(len(bench_setup.check(results, thresholds)), 1)
+        self.assertEqual(bench_setup.check(results, thresholds, latency=0.01), [])
+
+    def test_replay(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'session.jsonl')
+            connection = RecordingConnection(FakeConnection(), path)
+            profiles = {'home': [{'model': 'DELL U2414H'}, {'model':'DELL U2913WM', 'serial':'HFDVR4Z0NIRM'}]}
+            Setup(connection=connection).apply_profiles(profiles)
+            connection.close()
+
+            results = bench_setup.replay(path, profiles, repeat=2)
+
+        self.assertEqual(results['replay apply_profiles']['round_trips'], 2)
+        self.assertEqual(results['replay apply_profiles']['mismatches'], 0)
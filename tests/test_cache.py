@@ -0,0 +1,80 @@
+import unittest
+from sway_monitors import Setup, LayoutCache
+import os
+import tempfile
+from .FakeConnection import FakeConnection
+
+
+class LayoutCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'layouts.json')
+        self.profiles_path = os.path.join(self.directory.name, 'profiles.json')
+        with open(self.profiles_path, 'w') as f:
+            f.write('{}')
+
+        self.profiles = {'home': [{'model': 'DELL U2414H'}, {'model':'DELL U2913WM', 'serial':'HFDVR4Z0NIRM'}]}
+        self.connection = FakeConnection()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_fingerprint(self):
+        outputs = self.connection.get_outputs()
+        self.assertEqual(LayoutCache.fingerprint(outputs), LayoutCache.fingerprint(list(reversed(outputs))))
+        self.assertNotEqual(LayoutCache.fingerprint(outputs), LayoutCache.fingerprint(outputs[1:]))
+
+    def test_replay(self):
+        setup = Setup(connection=self.connection, layout_cache=LayoutCache(self.path, self.profiles_path))
+        self.assertIsNone(setup.replay_layout())
+        self.assertEqual(setup.apply_profiles(self.profiles), 'home')
+
+        self.connection.clear()
+        setup = Setup(fetch=False, connection=self.connection, layout_cache=LayoutCache(self.path, self.profiles_path))
+
+        self.assertEqual(setup.replay_layout(), 'home')
+        self.assertIsNone(setup.monitors)
+        self.assertEqual(self.connection.command_list, ["output DP-5 disable; output DP-3 position 0 0 resolution 1920x1080; output DP-4 position 1920 0 resolution 2560x1080"])
+
+    def test_replay_diff(self):
+        setup = Setup(connection=self.connection, layout_cache=LayoutCache(self.path, self.profiles_path), diff=True)
+        self.connection.clear()
+        self.assertEqual(setup.apply_profiles(self.profiles), 'home')
+
+        # Sway already runs these modes, only the positions were sent but the cache holds the whole layout
+        self.assertEqual(self.connection.command_list, ["output DP-3 position 0 0; output DP-4 position 1920 0"])
+        self.assertEqual(setup.layout_cache.get(setup.get_fingerprint())['command'],
+            "output DP-5 disable; output DP-3 position 0 0 resolution 1920x1080; output DP-4 position 1920 0 resolution 2560x1080")
+
+    def test_replay_workspaces(self):
+        profiles = {'home': {'monitors': self.profiles['home'], 'workspaces': {'2': {'name': 'DP-4'}}}}
+        setup = Setup(connection=self.connection, layout_cache=LayoutCache(self.path, self.profiles_path))
+        self.assertEqual(setup.apply_profiles(profiles), 'home')
+
+        # Replaying would leave the workspaces where they are, the profile is resolved again instead
+        setup = Setup(fetch=False, connection=self.connection, layout_cache=LayoutCache(self.path, self.profiles_path))
+        self.assertIsNone(setup.replay_layout())
+        self.assertEqual(setup.apply_profiles(profiles), 'home')
+        self.assertIn('workspace "2" output DP-4', self.connection.command_list[-1])
+
+    def test_replay_failed(self):
+        setup = Setup(connection=self.connection, layout_cache=LayoutCache(self.path, self.profiles_path))
+        setup.apply_profiles(self.profiles)
+
+        self.connection.fail_on = ['DP-5 disable']
+        setup = Setup(fetch=False, connection=self.connection, layout_cache=LayoutCache(self.path, self.profiles_path))
+
+        self.assertIsNone(setup.replay_layout())
+        self.assertEqual(len(setup.monitors), 3)
+        self.assertEqual(setup.layout_cache.layouts, {})
+
+    def test_source_changed(self):
+        setup = Setup(connection=self.connection, layout_cache=LayoutCache(self.path, self.profiles_path))
+        setup.apply_profiles(self.profiles)
+
+        stat = os.stat(self.profiles_path)
+        os.utime(self.profiles_path, (stat.st_atime, stat.st_mtime + 10))
+
+        cache = LayoutCache(self.path, self.profiles_path)
+        self.assertEqual(cache.layouts, {})
+        self.assertIsNone(setup.layout_cache.get(setup.get_fingerprint()))
@@ -0,0 +1,146 @@
+import unittest
+from sway_monitors import ProfileSet, RecordingConnection, Setup, cli
+import contextlib
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import unittest.mock
+from .FakeConnection import FakeConnection
+from .FakeSwayServer import FakeSwayServer
+
+
+class CliTest(unittest.TestCase):
+    def test_import_side_effects(self):
+        # Importing the library should neither configure logging nor load optional modules
+        code = 'import logging, sys, sway_monitors; print(len(logging.getLogger().handlers), "i3ipc" in sys.modules, "sway_monitors.layout" in sys.modules)'
+        output = subprocess.run([sys.executable, '-c', code], stdout=subprocess.PIPE, check=True)
+        self.assertEqual(output.stdout.split(), [b'0', b'False', b'False'])
+
+    def test_lazy_exports(self):
+        from sway_monitors import LayoutEngine, ProfileSet
+        self.assertEqual(ProfileSet.__module__, 'sway_monitors.profiles')
+
+        with self.assertRaises(ImportError):
+            from sway_monitors import DoesNotExist
+
+    def test_profile_startup(self):
+        timings = dict(cli.profile_startup(FakeConnection()))
+        self.assertEqual(list(timings), ['import sway_monitors', 'first get_outputs'])
+        self.assertGreater(timings['import sway_monitors'], 0)
+
+    def test_profile_startup_connect(self):
+        # Works without i3ipc as well, the built in client is timed then
+        server = FakeSwayServer()
+        self.addCleanup(server.close)
+        with unittest.mock.patch.dict(os.environ, {'SWAYSOCK': server.path}):
+            timings = [name for name, _ in cli.profile_startup()]
+
+        self.assertEqual(timings[0], 'import sway_monitors')
+        self.assertRegex(timings[1], '^connect (SwayConnection|Connection)$')
+        self.assertEqual(timings[2], 'first get_outputs')
+
+
+class CliProfilesTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'profiles.json')
+        self.write_profiles({'home': [{'model': 'DELL U2414H'}, {'model':'DELL U2913WM', 'serial':'HFDVR4Z0NIRM'}]})
+        self.connection = FakeConnection()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def write_profiles(self, profiles):
+        with open(self.path, 'w') as f:
+            f.write(json.dumps(profiles))
+
+    def run_cli(self, *argv):
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            code = cli.main([self.path, '--no-cache'] + list(argv), self.connection)
+
+        return code, output.getvalue()
+
+    def test_apply(self):
+        code, _ = self.run_cli()
+        self.assertEqual(code, 0)
+        self.assertEqual(self.connection.command_list, ["output DP-3 position 0 0 resolution 1920x1080; output DP-4 position 1920 0 resolution 2560x1080"])
+
+    def test_dry_run(self):
+        code, output = self.run_cli('--dry-run')
+        self.assertEqual(code, 0)
+        self.assertEqual(output.splitlines(), [
+            '# Profile home',
+            'output DP-3 position 0 0 resolution 1920x1080',
+            'output DP-4 position 1920 0 resolution 2560x1080',
+        ])
+        self.assertEqual(self.connection.command_list, [])
+
+    def test_dry_run_unknown_modes(self):
+        outputs = self.connection.get_outputs()
+        for output in outputs:
+            if not output['active']:
+                output['modes'] = []
+
+        self.connection.get_outputs = lambda: [dict(output) for output in outputs]
+        self.write_profiles({'other': [{'serial': 'GBI2MEXRS5CD'}]})
+
+        code, output = self.run_cli('--dry-run')
+        self.assertEqual(code, 1)
+        self.assertEqual(output.splitlines(), ['# Modes of DP-5 are not known without enabling them'])
+        self.assertEqual(self.connection.command_list, [])
+
+    def test_fallback(self):
+        self.write_profiles({'work': [{'serial': 'DOESNOTEXIST'}]})
+
+        code, _ = self.run_cli('--fallback', 'DP-4')
+        self.assertEqual(code, 1)
+        self.assertEqual(self.connection.command_list, ["output DP-3 disable; output DP-4 position 0 0 resolution 2560x1080"])
+
+    def test_fallback_failed_profile(self):
+        self.connection.fail_on = ['DP-4 position 1920']
+
+        code, _ = self.run_cli()
+        self.assertEqual(code, 1)
+        # The profile, its rollback and then the active output that is listed first on its own
+        self.assertEqual(len(self.connection.command_list), 3)
+        self.assertEqual(self.connection.command_list[-1], "output DP-4 disable; output DP-3 position 0 0 resolution 1920x1080")
+
+    def test_malformed_profiles(self):
+        with open(self.path, 'w') as f:
+            f.write('{"home": [')
+
+        stderr = io.StringIO()
+        with contextlib.redirect_stderr(stderr), self.assertRaises(SystemExit):
+            self.run_cli()
+
+        self.assertIn('Could not read profiles', stderr.getvalue())
+        self.assertEqual(self.connection.command_list, [])
+
+    def test_replay(self):
+        recording = os.path.join(self.directory.name, 'session.jsonl')
+        cache = os.path.join(self.directory.name, 'cache')
+        connection = RecordingConnection(self.connection, recording)
+        Setup(connection=connection).apply_profiles(ProfileSet.load(self.path))
+        connection.close()
+
+        output = io.StringIO()
+        with unittest.mock.patch.dict(os.environ, {'XDG_CACHE_HOME': cache}), contextlib.redirect_stdout(output):
+            code = cli.main([self.path, '--replay', recording])
+
+        self.assertEqual(code, 0)
+        self.assertFalse(os.path.exists(cache))
+
+    def test_replay_speed_without_replay(self):
+        with contextlib.redirect_stderr(io.StringIO()), self.assertRaises(SystemExit):
+            self.run_cli('--replay-speed', '2')
+
+    def test_timings(self):
+        code, output = self.run_cli('--timings')
+        lines = output.splitlines()
+        self.assertEqual(lines[0].split(), ['operation', 'ipc', 'ipc', 'ms', 'total', 'ms'])
+        self.assertIn('apply_profiles', [line.split()[0] for line in lines])
+        self.assertEqual(lines[-1].split()[0], 'total')
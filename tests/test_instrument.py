@@ -0,0 +1,93 @@
+import unittest
+from sway_monitors import InstrumentedConnection, JsonLinesSink, Metrics, Setup
+import json
+import os
+import tempfile
+from .FakeConnection import FakeConnection
+
+
+class InstrumentationTest(unittest.TestCase):
+    def setUp(self):
+        self.connection = FakeConnection()
+        self.setup = Setup(connection=self.connection)
+        self.events = []
+
+    def test_disabled(self):
+        self.assertIs(self.setup.connection, self.connection)
+        self.setup.enable([{'model': 'DELL U2414H'}])
+
+    def test_events(self):
+        self.setup.instrument(self.events.append)
+
+        self.setup.enable([{'model': 'DELL U2414H'}])
+
+        commands = [event for event in self.events if event['type'] == 'command']
+        self.assertEqual(len(commands), 2)
+        self.assertEqual(commands[0]['operation'], 'enable')
+        self.assertEqual(commands[0]['payload_bytes'], len("output DP-4 disable"))
+        self.assertTrue(commands[0]['success'])
+
+        operations = [(event['operation'], event['parent']) for event in self.events if event['type'] == 'operation']
+        self.assertEqual(operations, [('resolve_modes', 'enable'), ('enable', None)])
+
+    def test_failed_command(self):
+        self.connection.fail_on = ['DP-4']
+        self.setup.instrument(self.events.append)
+
+        with self.assertRaises(Exception):
+            self.setup.enable([{'model': 'DELL U2414H'}])
+
+        self.assertFalse([event for event in self.events if event['type'] == 'command'][0]['success'])
+        self.assertEqual(self.events[-1]['operation'], 'enable')
+        self.assertFalse(self.events[-1]['success'])
+
+    def test_workspaces(self):
+        metrics = Metrics()
+        self.connection.workspaces = [{'name': '1', 'output': 'DP-3', 'focused': True}]
+        self.setup.instrument(metrics)
+
+        self.setup.enable([{'name': 'DP-3'}, {'name': 'DP-4'}], transaction=True, workspaces={'1': {'name': 'DP-4'}})
+
+        # One query for the workspaces and one command for the outputs and the workspaces together
+        self.assertEqual(metrics.calls[('get_workspaces', 'plan_workspaces', 'true')], 1)
+        self.assertEqual(metrics.calls[('command', 'enable', 'true')], 1)
+
+    def test_grouped(self):
+        metrics = Metrics()
+        self.setup.instrument(metrics)
+
+        self.setup.fetch_monitors()
+        self.setup.apply_profiles({'home': [{'model': 'DELL U2414H'}]})
+
+        # The command belongs to the nested enable, apply_profiles only adds its wall clock time
+        summary = metrics.get_summary()
+        self.assertEqual(summary['fetch_monitors']['round_trips'], 1)
+        self.assertEqual(summary['enable']['round_trips'], 1)
+        self.assertEqual(summary['apply_profiles']['round_trips'], 0)
+        self.assertGreater(summary['apply_profiles']['seconds'], summary['enable']['seconds'])
+
+    def test_prometheus(self):
+        metrics = Metrics()
+        self.setup.instrument(metrics)
+        self.setup.fetch_monitors()
+
+        text = metrics.to_prometheus()
+
+        self.assertIn('sway_monitors_ipc_calls_total{type="get_outputs",operation="fetch_monitors",success="true"} 1', text)
+        self.assertIn('sway_monitors_ipc_latency_seconds_count{type="get_outputs",operation="fetch_monitors"} 1', text)
+        self.assertIn('# TYPE sway_monitors_ipc_latency_seconds histogram', text)
+
+    def test_json_lines(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'ipc.jsonl')
+            self.setup.instrument(JsonLinesSink(path))
+            self.setup.fetch_monitors()
+
+            with open(path) as f:
+                events = [json.loads(line) for line in f]
+
+        self.assertEqual([event['type'] for event in events], ['get_outputs', 'operation'])
+
+    def test_passthrough(self):
+        connection = InstrumentedConnection(self.connection)
+        self.assertEqual(connection.fail_on, [])
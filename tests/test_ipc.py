@@ -0,0 +1,93 @@
+import unittest
+from sway_monitors import Setup
+from sway_monitors.ipc import SwayConnection, IPCError
+import os
+import threading
+import time
+from .FakeSwayServer import FakeSwayServer
+
+
+class SwayConnectionTest(unittest.TestCase):
+    def setUp(self):
+        self.server = FakeSwayServer()
+        self.connection = SwayConnection(self.server.path, buffer_size=64)
+
+    def tearDown(self):
+        self.connection.close()
+        self.server.close()
+
+    def test_get_outputs(self):
+        outputs = self.connection.get_outputs()
+        self.assertEqual([output['name'] for output in outputs], ['DP-3', 'DP-4', 'DP-5'])
+
+        # The buffer grew to fit the reply and is reused afterwards
+        self.assertGreater(len(self.connection._buffer), 64)
+        self.assertEqual(len(self.connection.get_outputs()), 3)
+
+    def test_command(self):
+        self.assertEqual(self.connection.command('output DP-3 disable; output DP-4 enable'), [{'success': True}, {'success': True}])
+        self.assertEqual(self.server.command_list, ['output DP-3 disable; output DP-4 enable'])
+
+    def test_pipeline(self):
+        replies = self.connection.commands(['output DP-3 disable', 'output DP-4 disable', 'output DP-5 disable'])
+
+        self.assertEqual(len(replies), 3)
+        self.assertEqual(self.server.command_list, ['output DP-3 disable', 'output DP-4 disable', 'output DP-5 disable'])
+
+        outputs, workspaces = self.connection.pipeline([(3, ''), (1, '')])
+        self.assertEqual(len(outputs), 3)
+        self.assertEqual(workspaces, [])
+
+    def test_setup(self):
+        setup = Setup(connection=self.connection)
+        setup.enable([{'model': 'DELL U2414H'}], transaction=True)
+
+        self.assertEqual(self.server.command_list, ["output DP-4 disable; output DP-3 position 0 0 resolution 1920x1080"])
+
+    def test_events(self):
+        events = []
+        self.connection.on('output', lambda connection, event: events.append(event))
+
+        thread = threading.Thread(target=self.connection.main, daemon=True)
+        thread.start()
+        for _ in range(100):
+            if self.server.subscribers:
+                break
+
+            time.sleep(0.01)
+
+        self.server.emit('output', {'change': 'unspecified'}, 1)
+        self.server.emit('workspace', {'change': 'focus'}, 0)
+        for _ in range(100):
+            if events:
+                break
+
+            time.sleep(0.01)
+
+        self.connection.main_quit()
+        thread.join(1)
+
+        self.assertFalse(thread.is_alive())
+        self.assertEqual(events, [{'change': 'unspecified'}])
+
+    def test_timeout(self):
+        connection = SwayConnection(self.server.path, timeout=0.05)
+        self.server.delay = 0.2
+        with self.assertRaises(TimeoutError):
+            connection.command('output DP-3 disable')
+
+        # The late reply went to the old socket, the next request gets its own reply
+        self.server.delay = 0
+        self.assertEqual(len(connection.get_outputs()), 3)
+        connection.close()
+
+    def test_missing_socket(self):
+        environ = dict(os.environ)
+        os.environ.pop('SWAYSOCK', None)
+        os.environ.pop('I3SOCK', None)
+        try:
+            with self.assertRaises(IPCError):
+                SwayConnection()
+        finally:
+            os.environ.clear()
+            os.environ.update(environ)
@@ -0,0 +1,110 @@
+import unittest
+from sway_monitors import LayoutEngine, MonitorModeNotFoundError, Setup
+from .FakeConnection import FakeConnection
+
+
+class LayoutEngineTest(unittest.TestCase):
+    def setUp(self):
+        self.connection = FakeConnection()
+        self.setup = Setup(connection=self.connection)
+        self.small = self.setup.find_monitor({'name': 'DP-3'})
+        self.wide = self.setup.find_monitor({'name': 'DP-4'})
+        self.other = self.setup.find_monitor({'name': 'DP-5'})
+        self.engine = LayoutEngine()
+
+    def positions(self, placements):
+        return [(placement.monitor.name, placement.pos) for placement in placements]
+
+    def test_strip(self):
+        placements = self.engine.solve([{'monitor': self.small}, {'monitor': self.wide}])
+        self.assertEqual(self.positions(placements), [('DP-3', (0, 0)), ('DP-4', (1920, 0))])
+
+    def test_grid(self):
+        placements = self.engine.solve([
+            {'monitor': self.wide},
+            {'monitor': self.other, 'right_of': 0},
+            {'monitor': self.small, 'below': 0, 'align': 'center'},
+        ])
+        self.assertEqual(self.positions(placements), [('DP-4', (0, 0)), ('DP-5', (2560, 0)), ('DP-3', (320, 1080))])
+
+    def test_alignment(self):
+        placements = self.engine.solve([
+            {'monitor': self.wide, 'transform': '90'},
+            {'monitor': self.small, 'right_of': 0, 'align': 'bottom'},
+        ])
+        self.assertEqual(placements[0].get_size(), (1080, 2560))
+        self.assertEqual(self.positions(placements), [('DP-4', (0, 0)), ('DP-3', (1080, 1480))])
+
+    def test_left_of_normalized(self):
+        placements = self.engine.solve([
+            {'monitor': self.small},
+            {'monitor': self.wide, 'left_of': 0, 'offset': (0, -100)},
+        ])
+        self.assertEqual(self.positions(placements), [('DP-3', (2560, 100)), ('DP-4', (0, 0))])
+
+    def test_scale(self):
+        placements = self.engine.solve([
+            {'monitor': self.wide, 'scale': 2},
+            {'monitor': self.small},
+        ])
+        self.assertEqual(self.positions(placements), [('DP-4', (0, 0)), ('DP-3', (1280, 0))])
+        self.assertEqual(placements[0].get_actions(), ["position 0 0", "resolution 2560x1080", "scale 2"])
+
+    def test_current_scale_and_transform(self):
+        # Entries without a scale or transform keep the ones sway reports
+        self.small.meta_data['scale'] = 2.0
+        self.small.meta_data['transform'] = '90'
+        placements = self.engine.solve(LayoutEngine.strip([self.small, self.wide], [self.small.get_highest_mode(), self.wide.get_highest_mode()], 'right'))
+        self.assertEqual(self.positions(placements), [('DP-3', (0, 0)), ('DP-4', (540, 0))])
+
+        self.wide.meta_data['scale'] = 2.0
+        placements = self.engine.solve(LayoutEngine.strip([self.wide, self.small], [self.wide.get_highest_mode(), self.small.get_highest_mode()], 'down'))
+        self.assertEqual(self.positions(placements), [('DP-4', (0, 0)), ('DP-3', (0, 540))])
+
+        # An explicit value still wins
+        placements = self.engine.solve([{'monitor': self.small, 'scale': 1, 'transform': 'normal'}, {'monitor': self.wide}])
+        self.assertEqual(self.positions(placements), [('DP-3', (0, 0)), ('DP-4', (1920, 0))])
+
+    def test_mode_selection(self):
+        placement = self.engine.solve([{'monitor': self.small, 'mode': {'width': 1280, 'height': 1024}, 'refresh': 60000}])[0]
+        self.assertEqual(placement.mode.get_dimensions(), (1280, 1024))
+        self.assertEqual(placement.get_actions()[1], "resolution 1280x1024@60.020Hz")
+
+        with self.assertRaises(MonitorModeNotFoundError):
+            self.engine.solve([{'monitor': self.small, 'mode': {'width': 1281, 'height': 1024}}])
+
+    def test_select_mode_cached(self):
+        mode = self.small.select_mode()
+        self.assertIs(self.small.select_mode(), mode)
+        self.assertEqual(mode, self.small.get_highest_mode())
+
+        self.small.refresh_modes()
+        self.assertIsNot(self.small.select_mode(), mode)
+        self.assertEqual(self.small.select_mode(), mode)
+
+    def test_invalid_relation(self):
+        with self.assertRaises(ValueError):
+            self.engine.solve([{'monitor': self.small, 'right_of': 1}, {'monitor': self.wide}])
+
+        with self.assertRaises(ValueError):
+            self.engine.solve([{'monitor': self.small}, {'monitor': self.wide, 'right_of': 0, 'align': 'left'}])
+
+    def test_arrange(self):
+        self.connection.clear()
+
+        self.setup.arrange([
+            {'monitor': {'model': 'DELL U2414H'}},
+            {'monitor': {'serial': 'HFDVR4Z0NIRM'}, 'below': 0, 'transform': '180'},
+        ])
+
+        self.assertEqual(self.connection.command_list, ["output DP-3 position 0 0 resolution 1920x1080; output DP-4 position 0 1080 resolution 2560x1080 transform 180"])
+
+    def test_profile_layout(self):
+        self.connection.clear()
+
+        self.setup.apply_profiles({'home': [
+            {'monitor': {'model': 'DELL U2414H'}, 'position': (100, 0)},
+            {'monitor': {'serial': 'HFDVR4Z0NIRM'}, 'left_of': 0},
+        ]})
+
+        self.assertEqual(self.connection.command_list, ["output DP-3 position 2560 0 resolution 1920x1080; output DP-4 position 0 0 resolution 2560x1080"])
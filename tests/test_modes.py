@@ -0,0 +1,146 @@
+import unittest
+from sway_monitors import Setup, BandwidthCache, BandwidthPlanner, CommandError, ModeSelector, ModeTable
+from sway_monitors.modes import BandwidthCap, HighestMode, IntegerScale, NativeRefresh, Policy
+import os
+import tempfile
+from .FakeConnection import FakeConnection
+
+
+class ModeSelectorTest(unittest.TestCase):
+    def setUp(self):
+        self.connection = FakeConnection()
+        self.setup = Setup(connection=self.connection)
+        self.dell = self.setup.find_monitor({'name': 'DP-3'})
+        self.wide = self.setup.find_monitor({'name': 'DP-4'})
+
+    def dimensions(self, modes):
+        return [(mode.width, mode.height, mode.refresh) for mode in modes]
+
+    def test_columns(self):
+        width, height, refresh = self.dell.mode_columns
+        self.assertEqual(list(zip(width, height, refresh)), self.dimensions(self.dell.modes))
+
+        table = ModeTable([self.dell, self.wide])
+        self.assertEqual(len(table), len(self.dell.modes) + len(self.wide.modes))
+        self.assertIs(table.get_mode(table.offsets[1]), self.wide.modes[0])
+
+    def test_highest(self):
+        monitors = self.setup.monitors
+        self.assertEqual(ModeSelector().select(monitors), [monitor.get_highest_mode() for monitor in monitors])
+
+    def test_native_refresh(self):
+        self.assertEqual(self.dimensions(ModeSelector([NativeRefresh()]).select([self.dell])), [(1920, 1080, 60000)])
+
+    def test_integer_scale(self):
+        modes = ModeSelector([IntegerScale(1024), HighestMode()]).select([self.dell, self.wide])
+        self.assertEqual(self.dimensions(modes), [(1280, 1024, 75025), (1280, 1024, 75025)])
+
+    def test_bandwidth_cap(self):
+        modes = ModeSelector([HighestMode(), BandwidthCap(250000000)]).select([self.dell, self.wide])
+
+        # The wide monitor uses the most bandwidth, it steps down first
+        self.assertEqual(self.dimensions(modes), [(1920, 1080, 60000), (1920, 1080, 60000)])
+
+        with self.assertRaises(ValueError):
+            ModeSelector([HighestMode(), BandwidthCap(1000)]).select([self.dell, self.wide])
+
+    def test_excluded(self):
+        class Nothing(Policy):
+            def score(self, table):
+                return [None] * len(table)
+
+        with self.assertRaises(ValueError):
+            ModeSelector([Nothing()]).select([self.dell])
+
+    def test_find_mode(self):
+        self.assertEqual(self.dimensions([self.dell.find_mode({'width': 1920, 'height': 1080})]), [(1920, 1080, 60000)])
+        self.assertEqual(self.dimensions([self.dell.find_mode({'refresh': 75025})]), [(1280, 1024, 75025)])
+        self.assertIsNone(self.dell.find_mode({'width': 3840}))
+
+    def test_setup_policies(self):
+        self.setup.mode_policies = [HighestMode(), BandwidthCap(250000000)]
+        self.assertEqual(self.setup.plan([{'name': 'DP-3'}, {'name': 'DP-4'}]), [
+            "output DP-3 position 0 0 resolution 1920x1080@60.000Hz",
+            "output DP-4 position 1920 0 resolution 1920x1080@60.000Hz",
+        ])
+
+    def test_setup_refresh_only(self):
+        # Just below 1920x1080@60 Hz, the cap only takes the refresh rate down
+        self.setup.mode_policies = [HighestMode(), BandwidthCap(124300000)]
+        self.assertEqual(self.setup.plan([{'name': 'DP-3'}]), [
+            "output DP-4 disable",
+            "output DP-3 position 0 0 resolution 1920x1080@59.940Hz",
+        ])
+
+
+class BandwidthPlannerTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'bandwidth.json')
+        self.connection = FakeConnection()
+        self.setup = Setup(connection=self.connection)
+        self.setup.bandwidth_planner = BandwidthPlanner(cache=BandwidthCache(self.path))
+        self.targets = [{'name': 'DP-3'}, {'name': 'DP-4'}]
+        self.connection.clear()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_pixel_clock(self):
+        self.assertEqual(self.setup.find_monitor({'name': 'DP-4'}).get_highest_mode().get_pixel_clock(), 2560 * 1080 * 60)
+
+    def test_fits(self):
+        self.setup.enable(self.targets)
+        self.assertEqual(self.connection.command_list, ["output DP-3 position 0 0 resolution 1920x1080@60.000Hz; output DP-4 position 1920 0 resolution 2560x1080@60.000Hz"])
+
+    def test_downshift(self):
+        self.connection.fail_on = ['resolution 2560x1080']
+
+        modes = self.setup.enable(self.targets)
+
+        # Failed, rolled back and retried with the wide monitor one step down
+        self.assertEqual(len(self.connection.command_list), 3)
+        self.assertEqual(self.connection.command_list[-1], "output DP-3 position 0 0 resolution 1920x1080@60.000Hz; output DP-4 position 1920 0 resolution 1920x1080@60.000Hz")
+        self.assertEqual([mode.get_dimensions() for mode in modes], [(1920, 1080), (1920, 1080)])
+
+        # The limit of this dock is remembered, the next time the first try fits
+        self.connection.clear()
+        self.setup.bandwidth_planner = BandwidthPlanner(cache=BandwidthCache(self.path))
+        self.setup.enable(self.targets)
+        self.assertEqual(len(self.connection.command_list), 1)
+
+    def test_budget(self):
+        self.setup.bandwidth_planner = BandwidthPlanner({'DP-4': 130000000})
+        self.setup.enable(self.targets)
+        self.assertEqual(self.connection.command_list, ["output DP-3 position 0 0 resolution 1920x1080@60.000Hz; output DP-4 position 1920 0 resolution 1920x1080@60.000Hz"])
+
+    def test_refresh_step(self):
+        self.connection.fail_on = ['resolution 1920x1080@60.000Hz']
+
+        modes = self.setup.enable([{'name': 'DP-3'}])
+
+        # Only the refresh rate comes down, sway has to be told which one
+        self.assertEqual(len(self.connection.command_list), 3)
+        self.assertEqual(self.connection.command_list[-1], "output DP-4 disable; output DP-3 position 0 0 resolution 1920x1080@59.940Hz")
+        self.assertEqual([mode.refresh for mode in modes], [59940])
+        self.assertEqual(list(BandwidthCache(self.path).limits.values()), [1920 * 1080 * 60 - 1])
+
+    def test_nothing_fits(self):
+        self.connection.fail_on = ['resolution']
+
+        with self.assertRaises(CommandError):
+            self.setup.enable(self.targets)
+
+        # Every attempt is committed and rolled back, a dock that never worked does not learn a limit
+        self.assertEqual(len(self.connection.command_list), 2 * self.setup.bandwidth_planner.attempts)
+        self.assertEqual(BandwidthCache(self.path).limits, {})
+
+    def test_unrelated_failure(self):
+        self.connection.workspaces = [{'name': '1', 'output': 'DP-3', 'focused': True}]
+        self.connection.fail_on = ['move workspace']
+
+        with self.assertRaises(CommandError):
+            self.setup.enable(self.targets, workspaces={'1': {'name': 'DP-4'}})
+
+        self.assertEqual(len(self.connection.command_list), 2)
+        self.assertEqual(BandwidthCache(self.path).limits, {})
@@ -1,5 +1,5 @@
 import unittest
-from sway_monitors import MonitorMode, Setup, Monitor
+from sway_monitors import MonitorMode, Setup, Monitor, MonitorModeNotFoundError
 import json
 from .FakeConnection import FakeConnection
 
@@ -48,3 +48,31 @@ class MonitorTest(unittest.TestCase):
 
         monitor.background('./tests/ExistingWallpaper.jpg', 'fill')
         self.assertRegex(self.connection.command_list[0], "output DP-3 bg \S*/tests/ExistingWallpaper.jpg fill")
+
+    def test_sorted_modes(self):
+        monitor = self.monitors[0]
+        self.assertEqual(monitor.modes, sorted(monitor.modes))
+        self.assertEqual(monitor.get_highest_mode(), max(monitor.modes))
+
+    def test_active_mode(self):
+        monitor = self.monitors[0]
+        self.assertEqual(monitor.get_active_mode(), MonitorMode({'width': 1920, 'height': 1080, 'refresh': 60000}))
+        self.assertTrue(monitor.get_active_mode().active)
+
+    def test_get_mode(self):
+        monitor = self.monitors[0]
+        self.assertEqual(monitor.get_mode({'width': 720, 'height': 400}), [MonitorMode({'width': 720, 'height': 400, 'refresh': 70082})])
+
+        with self.assertRaises(MonitorModeNotFoundError):
+            monitor.get_mode({'width': 721, 'height': 400})
+
+    def test_lazy_modes(self):
+        monitor = self.monitors[0]
+        self.assertIsNone(monitor._modes)
+        self.assertTrue(monitor.has_modes())
+        self.assertEqual(monitor.get_mode_properties()[-1], {'width': 1920, 'height': 1080, 'refresh': 60000})
+        self.assertIsNone(monitor._modes)
+
+        self.assertEqual(monitor.get_highest_mode().get_dimensions(), (1920, 1080))
+        self.assertIsNotNone(monitor._modes)
+        self.assertEqual(monitor.get_mode_properties()[-1], {'width': 1920, 'height': 1080, 'refresh': 60000})
@@ -84,3 +84,18 @@ class MonitorModeTest(unittest.TestCase):
 
     def test_max(self):
         self.assertEqual(max(self.unorderedModes), self.largeFastMode)
+
+    def test_hash(self):
+        self.assertEqual(len({self.smallFastMode, MonitorMode({'width': 1920, 'height': 1080, 'refresh': 60000})}), 1)
+        self.assertEqual(len(set(self.unorderedModes)), 4)
+
+    def test_same_pixels(self):
+        wide = MonitorMode({'width': 2400, 'height': 960, 'refresh': 60000})
+        tall = MonitorMode({'width': 1920, 'height': 1200, 'refresh': 60000})
+        self.assertNotEqual(wide, tall)
+        self.assertTrue(wide > tall or wide < tall)
+
+    def test_compare_other(self):
+        self.assertNotEqual(self.smallFastMode, (1920, 1080))
+        with self.assertRaises(TypeError):
+            self.smallFastMode < (1920, 1080)
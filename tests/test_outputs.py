@@ -0,0 +1,92 @@
+import unittest
+from sway_monitors import CachedConnection, InstrumentedConnection, Setup
+from sway_monitors.ipc import SwayConnection
+import threading
+import time
+from .FakeConnection import FakeConnection
+from .FakeSwayServer import FakeSwayServer
+
+
+class CountingConnection(FakeConnection):
+    def __init__(self):
+        super().__init__()
+        self.fetches = 0
+
+    def get_outputs(self):
+        self.fetches += 1
+        return super().get_outputs()
+
+
+class CachedConnectionTest(unittest.TestCase):
+    def setUp(self):
+        self.connection = CountingConnection()
+        self.cached = CachedConnection(self.connection)
+
+    def test_shared_snapshot(self):
+        first = self.cached.get_outputs()
+        first[0].pop('modes')
+
+        # Callers can not change the snapshot for each other
+        self.assertIn('modes', self.cached.get_outputs()[0])
+        self.assertEqual(self.connection.fetches, 1)
+        self.assertEqual((self.cached.hits, self.cached.misses), (1, 1))
+
+    def test_output_command(self):
+        self.cached.get_outputs()
+        self.cached.command('workspace 1')
+        self.cached.get_outputs()
+        self.assertEqual(self.connection.fetches, 1)
+
+        self.cached.command('workspace 1; output DP-3 disable')
+        self.assertEqual(self.cached.generation, 1)
+        self.cached.get_outputs()
+        self.assertEqual(self.connection.fetches, 2)
+
+    def test_refresh_modes(self):
+        setup = Setup(connection=self.connection)
+        setup.cache_outputs()
+        self.connection.fetches = 0
+
+        for monitor in setup.monitors:
+            monitor.refresh_modes()
+
+        self.assertEqual(self.connection.fetches, 1)
+
+    def test_below_instrumentation(self):
+        setup = Setup(connection=self.connection)
+        events = []
+        setup.instrument(events.append)
+        cached = setup.cache_outputs()
+
+        self.assertIsInstance(setup.connection, InstrumentedConnection)
+        self.assertIs(setup.connection.connection, cached)
+        self.assertIs(setup.cache_outputs(), cached)
+
+    def test_output_event(self):
+        server = FakeSwayServer()
+        connection = SwayConnection(server.path)
+        cached = CachedConnection(connection)
+        thread = threading.Thread(target=connection.main, daemon=True)
+        try:
+            cached.get_outputs()
+            thread.start()
+            for _ in range(100):
+                if server.subscribers:
+                    break
+
+                time.sleep(0.01)
+
+            server.emit('output', {'change': 'unspecified'}, 1)
+            for _ in range(100):
+                if cached.generation > 0:
+                    break
+
+                time.sleep(0.01)
+
+            self.assertEqual(cached.generation, 1)
+            cached.get_outputs()
+            self.assertEqual(cached.misses, 2)
+        finally:
+            connection.close()
+            thread.join(1)
+            server.close()
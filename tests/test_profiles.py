@@ -0,0 +1,73 @@
+import unittest
+from sway_monitors import Setup, Profile, ProfileSet
+import os
+import tempfile
+from .FakeConnection import FakeConnection
+
+
+class ProfileSetTest(unittest.TestCase):
+    def setUp(self):
+        self.connection = FakeConnection()
+        self.setup = Setup(connection=self.connection)
+
+    def test_from_dict(self):
+        profiles = ProfileSet.from_dict({
+            'home': [{'model': 'DELL U2414H'}],
+            'work': {'monitors': [{'model': 'DELL U2414H'}], 'priority': 2, 'direction': 'down'},
+        })
+
+        self.assertEqual([profile.name for profile in profiles], ['home', 'work'])
+        self.assertEqual(profiles.get('work').priority, 2)
+        self.assertEqual(profiles.get('work').direction, 'down')
+        self.assertEqual(profiles.get('home').priority, 0)
+        # Shared properties are only looked up once
+        self.assertEqual(len(profiles.properties), 1)
+
+    def test_load(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'profiles.json')
+            with open('example/setup.example.json') as f, open(path, 'w') as g:
+                g.write(f.read())
+
+            profiles = ProfileSet.load(path)
+
+        self.assertEqual([profile.name for profile in profiles], ['home_setup', 'work_setup'])
+        self.assertEqual(len(profiles.get('home_setup').monitors), 3)
+
+    def test_match(self):
+        profiles = ProfileSet([
+            Profile('missing', [{'model': 'DELL U2414'}]),
+            Profile('ambiguous', [{'model': 'DELL U2913WM'}]),
+            Profile('single', [{'model': 'DELL U2414H'}]),
+            Profile('dual', [{'model': 'DELL U2414H'}, {'serial': 'HFDVR4Z0NIRM'}], priority=1),
+        ])
+
+        match = profiles.match(self.setup)
+
+        self.assertEqual(match.profile.name, 'dual')
+        self.assertEqual(match.failures['missing'], 'no monitor matches {"model": "DELL U2414"}')
+        self.assertEqual(match.failures['ambiguous'], '2 monitors match {"model": "DELL U2913WM"}')
+        self.assertEqual(match.failures['single'], 'outranked by dual')
+
+    def test_match_order(self):
+        profiles = ProfileSet.from_dict({
+            'first': [{'model': 'DELL U2414H'}],
+            'second': [{'serial': 'HFDVR4Z0NIRM'}],
+        })
+
+        self.assertEqual(profiles.match(self.setup).profile.name, 'first')
+
+    def test_no_match(self):
+        match = ProfileSet.from_dict({'work': [{'model': 'DELL U2414'}]}).match(self.setup)
+
+        self.assertFalse(match)
+        self.assertIsNone(match.profile)
+
+    def test_apply_direction(self):
+        self.connection.clear()
+
+        self.setup.apply_profiles(ProfileSet.from_dict({
+            'home': {'monitors': [{'model': 'DELL U2414H'}, {'serial': 'HFDVR4Z0NIRM'}], 'direction': 'down'},
+        }))
+
+        self.assertEqual(self.connection.command_list, ["output DP-3 position 0 0 resolution 1920x1080; output DP-4 position 0 1080 resolution 2560x1080"])
@@ -0,0 +1,139 @@
+import unittest
+from sway_monitors import Setup, Reconciler
+from .FakeConnection import FakeConnection
+from .SimulatedClock import SimulatedClock
+
+
+class HotplugConnection(FakeConnection):
+    def __init__(self):
+        super().__init__()
+        self.outputs = super().get_outputs()
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.on_command = None
+        self.handlers = {}
+
+    def command(self, command, result=None):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            if self.on_command is not None:
+                self.on_command(command)
+
+            return super().command(command, result)
+        finally:
+            self.in_flight -= 1
+
+    def get_outputs(self):
+        return [dict(output) for output in self.outputs]
+
+    def on(self, event, handler):
+        self.handlers.setdefault(event, []).append(handler)
+
+    def emit(self, event):
+        for handler in self.handlers.get(event, []):
+            handler(self, {'change': 'unspecified'})
+
+
+class ReconcilerTest(unittest.TestCase):
+    def setUp(self):
+        self.connection = HotplugConnection()
+        self.profiles = {
+            'home': [{'model': 'DELL U2414H'}, {'model':'DELL U2913WM', 'serial':'HFDVR4Z0NIRM'}],
+            'laptop': [{'model': 'DELL U2414H'}],
+        }
+        self.docked = self.connection.outputs
+        self.connection.outputs = [output for output in self.docked if output['name'] == 'DP-3']
+
+        self.setup = Setup(connection=self.connection)
+        self.clock = SimulatedClock()
+        self.reconciler = Reconciler(self.setup, self.profiles, window=0.2, clock=self.clock)
+        self.assertEqual(self.reconciler.reconcile(), 'laptop')
+        self.reconciler.start()
+        self.connection.clear()
+
+    def dock(self):
+        self.connection.outputs = self.docked
+        # Every panel of the dock shows up with its own event
+        for _ in range(len(self.docked)):
+            self.connection.emit('output')
+            self.clock.advance(0.05)
+
+    def test_burst(self):
+        self.dock()
+        self.assertEqual(self.connection.command_list, [])
+        self.assertEqual(self.reconciler.state, 'pending')
+
+        self.clock.advance(0.2)
+
+        self.assertEqual(self.connection.command_list, ["output DP-3 position 0 0 resolution 1920x1080; output DP-4 position 1920 0 resolution 2560x1080"])
+        self.assertEqual(self.reconciler.superseded, 2)
+        self.assertEqual(self.reconciler.applies, 2)
+        self.assertTrue(self.reconciler.is_idle())
+
+    def test_window_restarts(self):
+        self.connection.emit('output')
+        self.clock.advance(0.15)
+        self.connection.emit('output')
+        self.clock.advance(0.15)
+        self.assertEqual(self.reconciler.state, 'pending')
+
+        self.clock.advance(0.05)
+        self.assertTrue(self.reconciler.is_idle())
+        self.assertEqual(self.clock.pending(), 0)
+
+    def test_own_modeset(self):
+        # Sway reports our own changes as output events as well, the outputs stay the same
+        self.connection.emit('output')
+        self.clock.advance(1)
+
+        self.assertEqual(self.connection.command_list, [])
+        self.assertEqual(self.reconciler.applies, 1)
+
+    def test_event_while_applying(self):
+        self.connection.on_command = lambda command: self.connection.emit('output')
+        self.connection.outputs = self.docked
+        self.connection.emit('output')
+        self.clock.advance(0.2)
+
+        # The event during the apply did not start a second one, it is queued behind it
+        self.assertEqual(self.connection.max_in_flight, 1)
+        self.assertEqual(self.reconciler.state, 'pending')
+        self.assertEqual(len(self.connection.command_list), 1)
+
+        self.clock.advance(0.2)
+        self.assertTrue(self.reconciler.is_idle())
+        self.assertEqual(len(self.connection.command_list), 1)
+
+    def test_failed_apply(self):
+        # Sway emits output events for the failed modeset and the rollback as well
+        self.connection.on_command = lambda command: self.connection.emit('output')
+        self.connection.fail_on = ['DP-4 position']
+        self.dock()
+        self.clock.advance(5)
+
+        # Committed and rolled back once, the events of the rollback do not start another try
+        self.assertEqual(len(self.connection.command_list), 2)
+        self.assertTrue(self.reconciler.is_idle())
+        self.assertEqual(self.reconciler.failed, self.reconciler.observed)
+        self.assertNotEqual(self.reconciler.observed, self.reconciler.desired)
+
+        # Only a change of the outputs tries again
+        self.connection.fail_on = []
+        self.connection.outputs = [output for output in self.docked if output['name'] == 'DP-3']
+        self.connection.emit('output')
+        self.clock.advance(0.2)
+        self.connection.outputs = self.docked
+        self.connection.emit('output')
+        self.clock.advance(1)
+        self.assertEqual(self.reconciler.observed, self.reconciler.desired)
+        self.assertIsNone(self.reconciler.failed)
+        self.assertTrue(self.reconciler.is_idle())
+
+    def test_cancel(self):
+        self.dock()
+        self.reconciler.cancel()
+        self.clock.advance(1)
+
+        self.assertEqual(self.connection.command_list, [])
+        self.assertTrue(self.reconciler.is_idle())
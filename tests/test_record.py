@@ -0,0 +1,94 @@
+import unittest
+from sway_monitors import RecordingConnection, ReplayConnection, Setup
+from sway_monitors.record import ReplayError, read_recording
+import json
+import os
+import tempfile
+import time
+from .FakeConnection import FakeConnection
+
+
+class RecordingTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'session.jsonl')
+        self.connection = FakeConnection()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def record_session(self, **kwargs):
+        connection = RecordingConnection(self.connection, self.path, **kwargs)
+        setup = Setup(connection=connection)
+        setup.enable([{'model': 'DELL U2414H'}, {'model':'DELL U2913WM', 'serial':'HFDVR4Z0NIRM'}], transaction=True)
+        connection.close()
+
+    def test_record(self):
+        self.record_session()
+
+        records = read_recording(self.path)
+        self.assertEqual([record['type'] for record in records], ['get_outputs', 'command'])
+        self.assertEqual([output['name'] for output in records[0]['reply']], ['DP-3', 'DP-4', 'DP-5'])
+        self.assertIn('modes', records[0]['reply'][0])
+        self.assertEqual(records[1]['payload'], self.connection.command_list[0])
+        self.assertEqual(records[1]['reply'], [{'success': True}, {'success': True}])
+        self.assertGreaterEqual(records[1]['latency'], 0)
+
+    def test_rotation(self):
+        self.record_session()
+        size = os.path.getsize(self.path)
+        os.remove(self.path)
+
+        # Every file fits one session, the timings vary a few bytes in length
+        for _ in range(4):
+            self.record_session(max_bytes=size + 64, backups=2)
+
+        self.assertTrue(os.path.exists(self.path + '.2'))
+        self.assertFalse(os.path.exists(self.path + '.3'))
+
+        # Only the newest records are kept, in the order they were written
+        records = read_recording(self.path)
+        self.assertEqual([record['type'] for record in records], ['get_outputs', 'command'] * 3)
+        with open(self.path) as f:
+            self.assertEqual([json.loads(line) for line in f], records[-2:])
+
+    def test_replay(self):
+        self.record_session()
+
+        connection = ReplayConnection(self.path)
+        setup = Setup(connection=connection)
+        setup.enable([{'model': 'DELL U2414H'}, {'model':'DELL U2913WM', 'serial':'HFDVR4Z0NIRM'}], transaction=True)
+
+        self.assertEqual(connection.mismatches, [])
+        self.assertEqual(connection.get_remaining(), {'command': 0, 'get_outputs': 0, 'get_workspaces': 0})
+
+        with self.assertRaises(ReplayError):
+            connection.get_outputs()
+
+    def test_replay_mismatch(self):
+        self.record_session()
+
+        connection = ReplayConnection(self.path, strict=True)
+        setup = Setup(connection=connection)
+        with self.assertRaises(ReplayError):
+            setup.enable([{'model': 'DELL U2414H'}], transaction=True)
+
+    def test_replay_speed(self):
+        records = [{'type': 'get_outputs', 'time': 0, 'latency': 0.2, 'reply': []}]
+
+        start = time.perf_counter()
+        ReplayConnection(records, speed=10).get_outputs()
+        self.assertLess(time.perf_counter() - start, 0.15)
+        self.assertGreaterEqual(time.perf_counter() - start, 0.02)
+
+    def test_replay_events(self):
+        records = [
+            {'type': 'event', 'event': 'output', 'time': 0.0, 'data': {'change': 'unspecified'}},
+            {'type': 'get_outputs', 'time': 0.1, 'latency': 0.0, 'reply': self.connection.get_outputs()},
+        ]
+        connection = ReplayConnection(records)
+        outputs = []
+        connection.on('output', lambda connection, event: outputs.append(connection.get_outputs()))
+        connection.main()
+
+        self.assertEqual(len(outputs[0]), 3)
@@ -0,0 +1,64 @@
+import unittest
+from sway_monitors import Coordinator
+import os
+import tempfile
+from .FakeSwayServer import FakeSwayServer
+
+
+class CoordinatorTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.servers = [FakeSwayServer(path=os.path.join(self.directory.name, 'sway-ipc.1000.{:n}.sock'.format(pid))) for pid in (101, 102, 103)]
+        self.profiles = {'home': [{'model': 'DELL U2414H'}, {'model':'DELL U2913WM', 'serial':'HFDVR4Z0NIRM'}]}
+
+    def tearDown(self):
+        for server in self.servers:
+            server.close()
+
+        self.directory.cleanup()
+
+    def test_discover(self):
+        # Left over files that are not sockets are ignored
+        with open(os.path.join(self.directory.name, 'sway-ipc.1000.104.sock'), 'w') as f:
+            f.write('')
+
+        self.assertEqual(Coordinator.discover(self.directory.name), [server.path for server in self.servers])
+
+    def test_apply_profiles(self):
+        with Coordinator.connect(Coordinator.discover(self.directory.name)) as coordinator:
+            self.assertEqual(len(coordinator), 3)
+            report = coordinator.apply_profiles(self.profiles)
+
+        self.assertTrue(report.is_ok())
+        self.assertEqual(set(report.get_values().values()), {'home'})
+        self.assertEqual(sorted(report.get_timings()), sorted(server.path for server in self.servers))
+        for server in self.servers:
+            self.assertEqual(server.command_list, ["output DP-3 position 0 0 resolution 1920x1080; output DP-4 position 1920 0 resolution 2560x1080"])
+
+    def test_parallel(self):
+        with Coordinator.connect([server.path for server in self.servers]) as coordinator:
+            for server in self.servers:
+                server.delay = 0.1
+
+            report = coordinator.apply_profiles(self.profiles)
+
+        # Every instance waits 0.1 s for its reply, one after the other would take three times as long
+        self.assertGreaterEqual(min(report.get_timings().values()), 0.1)
+        self.assertLess(report.seconds, 0.25)
+
+    def test_failing_instance(self):
+        self.servers[1].fail_on = ['DP-4 position']
+        with Coordinator.connect([server.path for server in self.servers]) as coordinator:
+            report = coordinator.apply_profiles(self.profiles)
+
+        self.assertFalse(report.is_ok())
+        self.assertEqual([result.path for result in report.get_failed()], [self.servers[1].path])
+        self.assertEqual(len(report.get_values()), 2)
+
+    def test_unreachable_socket(self):
+        path = self.servers[2].path
+        self.servers[2].close()
+
+        with Coordinator.connect([server.path for server in self.servers]) as coordinator:
+            self.assertNotIn(path, coordinator.setups)
+            self.assertEqual(len(coordinator), 2)
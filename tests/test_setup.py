@@ -1,6 +1,7 @@
 import unittest
-from sway_monitors import MonitorMode, Setup, Monitor
-import pprint
+from sway_monitors import Setup, Monitor, CommandError, ModeCache, MonitorModeNotFoundError
+import os
+import tempfile
 from .FakeConnection import FakeConnection
 
 
@@ -102,3 +103,193 @@ class SetupTest(unittest.TestCase):
 
     def test_get_monitors(self):
         pass
+
+    def test_enable_transaction(self):
+        self.connection.clear()
+
+        self.setup.enable([
+            {'model': 'DELL U2414H'},
+            {'model':'DELL U2913WM', 'serial':'HFDVR4Z0NIRM'}
+        ], transaction=True)
+
+        self.assertEqual(len(self.connection.command_list), 1)
+        self.assertEqual(self.connection.command_list[0], "output DP-3 position 0 0 resolution 1920x1080; output DP-4 position 1920 0 resolution 2560x1080")
+
+    def test_enable_transaction_disable_monitor(self):
+        self.connection.clear()
+
+        self.setup.enable([
+            {'model': 'DELL U2414H'}
+        ], transaction=True)
+
+        self.assertEqual(self.connection.command_list, ["output DP-4 disable; output DP-3 position 0 0 resolution 1920x1080"])
+
+    def test_enable_transaction_rollback(self):
+        self.connection.clear()
+        self.connection.fail_on = ['DP-4 position 1920 0']
+
+        with self.assertRaises(CommandError):
+            self.setup.enable([
+                {'model': 'DELL U2414H'},
+                {'model':'DELL U2913WM', 'serial':'HFDVR4Z0NIRM'}
+            ], transaction=True)
+
+        self.assertEqual(len(self.connection.command_list), 2)
+        self.assertEqual(self.connection.command_list[1], "output DP-3 enable position 2560 0 resolution 1920x1080@60.000Hz scale 1 transform normal; output DP-4 enable position 0 0 resolution 2560x1080@60.000Hz scale 1 transform normal; output DP-5 disable")
+
+    def test_transaction(self):
+        self.connection.clear()
+
+        with self.setup.transaction():
+            for monitor in self.setup.get_active_monitors():
+                monitor.background('./tests/ExistingWallpaper.jpg')
+
+        self.assertEqual(len(self.connection.command_list), 1)
+        self.assertRegex(self.connection.command_list[0], r"^output DP-3 bg \S*/tests/ExistingWallpaper.jpg fill; output DP-4 bg \S*/tests/ExistingWallpaper.jpg fill$")
+
+    def test_find_monitors(self):
+        self.assertEqual([monitor.name for monitor in self.setup.find_monitors({'model': 'DELL U2913WM'})], ['DP-4', 'DP-5'])
+        self.assertEqual([monitor.name for monitor in self.setup.find_monitors({'model': 'DELL U2913WM', 'serial': 'GBI2MEXRS5CD'})], ['DP-5'])
+        self.assertEqual([monitor.name for monitor in self.setup.find_monitors({'model': 'DELL U2913WM', 'transform': 'normal'})], ['DP-4', 'DP-5'])
+        self.assertEqual(self.setup.find_monitors({'model': 'DELL U2414H', 'serial': 'GBI2MEXRS5CD'}), [])
+
+    def test_update_monitors(self):
+        dp4 = self.setup.find_monitor({'name': 'DP-4'})
+        data = [output for output in self.connection.get_outputs() if output['name'] != 'DP-3']
+        data[0]['serial'] = 'CHANGED'
+
+        added, removed = self.setup.update_monitors(data)
+
+        self.assertEqual(added, [])
+        self.assertEqual([monitor.name for monitor in removed], ['DP-3'])
+        self.assertFalse(self.setup.is_connected({'model': 'DELL U2414H'}))
+        self.assertIs(self.setup.find_monitor({'serial': 'CHANGED'}), dp4)
+        self.assertFalse(self.setup.is_connected({'serial': 'HFDVR4Z0NIRM'}))
+
+    def test_apply_profiles(self):
+        self.connection.clear()
+        profiles = {
+            'work': [{'model': 'DELL U2414'}],
+            'home': [{'model': 'DELL U2414H'}],
+        }
+
+        self.assertEqual(self.setup.apply_profiles(profiles), 'home')
+        self.assertEqual(self.connection.command_list, ["output DP-4 disable; output DP-3 position 0 0 resolution 1920x1080"])
+
+        self.assertIsNone(self.setup.apply_profiles({'work': [{'model': 'DELL U2414'}]}))
+
+    def test_refresh(self):
+        profiles = {'home': [{'model': 'DELL U2414H'}, {'model':'DELL U2913WM', 'serial':'HFDVR4Z0NIRM'}]}
+        self.setup.load_monitors([output for output in self.connection.get_outputs() if output['name'] != 'DP-3'])
+        dp4 = self.setup.find_monitor({'name': 'DP-4'})
+        self.connection.clear()
+
+        self.assertEqual(self.setup.refresh(profiles), 'home')
+        self.assertIs(self.setup.find_monitor({'name': 'DP-4'}), dp4)
+        self.assertEqual(len(self.connection.command_list), 1)
+
+        # Nothing was plugged in since
+        self.assertIsNone(self.setup.refresh(profiles))
+        self.assertEqual(len(self.connection.command_list), 1)
+
+    def test_enable_inactive(self):
+        self.connection.clear()
+
+        self.setup.enable([{'model':'DELL U2913WM', 'serial':'GBI2MEXRS5CD'}])
+
+        # The modes of the disabled monitor are known, no need to enable it first
+        self.assertEqual(self.connection.command_list[-1], "output DP-5 position 0 0 resolution 2560x1080")
+        self.assertNotIn("output DP-5 enable", self.connection.command_list)
+
+    def test_resolve_modes(self):
+        monitors = [self.setup.find_monitor({'name': 'DP-4'}), self.setup.find_monitor({'name': 'DP-5'})]
+        for monitor in monitors:
+            monitor.modes = []
+
+        calls = []
+        get_outputs = self.connection.get_outputs
+        self.connection.get_outputs = lambda: calls.append(1) or get_outputs()
+        self.connection.clear()
+
+        self.setup.resolve_modes(monitors)
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(self.connection.command_list, ["output DP-5 enable"])
+        self.assertEqual(monitors[1].get_highest_mode().get_dimensions(), (2560, 1080))
+
+    def test_mode_cache(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'modes.json')
+            Setup(connection=self.connection, mode_cache=ModeCache(path))
+            self.assertTrue(os.path.exists(path))
+
+            setup = Setup(connection=self.connection, mode_cache=ModeCache(path))
+            monitor = setup.find_monitor({'name': 'DP-5'})
+            monitor.modes = []
+            self.connection.clear()
+
+            setup.resolve_modes([monitor])
+
+            self.assertEqual(self.connection.command_list, [])
+            self.assertEqual(monitor.get_highest_mode().get_dimensions(), (2560, 1080))
+
+    def test_plan(self):
+        self.connection.clear()
+
+        commands = self.setup.plan([{'model': 'DELL U2414H'}])
+
+        self.assertEqual(commands, ["output DP-4 disable", "output DP-3 position 0 0 resolution 1920x1080"])
+        self.assertEqual(self.connection.command_list, [])
+
+    def test_plan_unknown_modes(self):
+        self.setup.find_monitor({'name': 'DP-5'}).modes = []
+        self.connection.clear()
+
+        # Learning the modes would mean enabling the output, planning never sends anything
+        with self.assertRaises(MonitorModeNotFoundError):
+            self.setup.plan([{'name': 'DP-5'}])
+
+        self.assertEqual(self.connection.command_list, [])
+
+    def test_plan_diff(self):
+        self.setup.diff = True
+
+        # Sway already has this exact layout
+        self.assertEqual(self.setup.plan([
+            {'model':'DELL U2913WM', 'serial':'HFDVR4Z0NIRM'},
+            {'model': 'DELL U2414H'}
+        ]), [])
+
+        # Only the positions change, the modes stay the same
+        self.assertEqual(self.setup.plan([
+            {'model': 'DELL U2414H'},
+            {'model':'DELL U2913WM', 'serial':'HFDVR4Z0NIRM'}
+        ]), ["output DP-3 position 0 0", "output DP-4 position 1920 0"])
+
+        self.assertEqual(self.setup.plan([{'model':'DELL U2913WM', 'serial':'HFDVR4Z0NIRM'}]), ["output DP-3 disable"])
+
+        self.assertEqual(self.setup.plan([
+            {'model':'DELL U2913WM', 'serial':'GBI2MEXRS5CD'}
+        ], direction="down"), [
+            "output DP-3 disable",
+            "output DP-4 disable",
+            "output DP-5 enable position 0 0 resolution 2560x1080",
+        ])
+
+    def test_enable_diff_nothing_changed(self):
+        self.setup.diff = True
+        self.connection.clear()
+
+        self.setup.enable([
+            {'model':'DELL U2913WM', 'serial':'HFDVR4Z0NIRM'},
+            {'model': 'DELL U2414H'}
+        ], transaction=True)
+        self.assertEqual(self.connection.command_list, [])
+
+    def test_plan_profiles(self):
+        self.assertEqual(self.setup.plan_profiles({'work': [{'model': 'DELL U2414'}]}), (None, []))
+        self.assertEqual(self.setup.plan_profiles({'home': [{'model': 'DELL U2414H'}]}), ('home', ["output DP-4 disable", "output DP-3 position 0 0 resolution 1920x1080"]))
+
+    def test_check_setup_lazy(self):
+        self.setup.check_setup([{'model': 'DELL U2414H'}, {'model':'DELL U2913WM', 'serial':'HFDVR4Z0NIRM'}])
+        self.assertTrue(all(monitor._modes is None for monitor in self.setup.monitors))
@@ -0,0 +1,75 @@
+import unittest
+from sway_monitors import Setup, Snapshot, CommandError
+from .FakeConnection import FakeConnection
+
+
+class SnapshotTest(unittest.TestCase):
+    def setUp(self):
+        self.connection = FakeConnection()
+        self.setup = Setup(connection=self.connection)
+
+    def test_snapshot(self):
+        snapshot = self.setup.snapshot()
+
+        self.assertEqual(len(snapshot), 3)
+        self.assertEqual(snapshot.get('DP-3').to_dict(), {
+            'name': 'DP-3',
+            'active': True,
+            'mode': [1920, 1080, 60000],
+            'position': [2560, 0],
+            'scale': 1.0,
+            'transform': 'normal',
+            'background': None,
+        })
+        self.assertFalse(snapshot.get('DP-5').active)
+
+    def test_serialize(self):
+        self.setup.find_monitor({'name': 'DP-3'}).background('./tests/ExistingWallpaper.jpg')
+        snapshot = self.setup.snapshot()
+
+        restored = Snapshot.from_json(snapshot.to_json())
+        self.assertEqual(restored, snapshot)
+        self.assertRegex(restored.get('DP-3').background, '/tests/ExistingWallpaper.jpg fill$')
+
+    def test_commands(self):
+        self.assertEqual(self.setup.snapshot().get_commands(), [
+            "output DP-3 enable position 2560 0 resolution 1920x1080@60.000Hz scale 1 transform normal",
+            "output DP-4 enable position 0 0 resolution 2560x1080@60.000Hz scale 1 transform normal",
+            "output DP-5 disable",
+        ])
+
+    def test_restore_after_failure(self):
+        snapshot = self.setup.snapshot()
+        self.connection.clear()
+        self.connection.fail_on = ['DP-4 position 1920 0']
+
+        with self.assertRaises(CommandError):
+            self.setup.enable([
+                {'model': 'DELL U2414H'},
+                {'model':'DELL U2913WM', 'serial':'HFDVR4Z0NIRM'}
+            ])
+
+        # Whatever was applied before the failure is undone with one command
+        self.assertEqual(len(self.connection.command_list), 3)
+        self.assertEqual(self.connection.command_list[-1], snapshot.get_command())
+
+    def test_restore_background(self):
+        monitor = self.setup.find_monitor({'name': 'DP-3'})
+        snapshot = self.setup.snapshot()
+        monitor.background('./tests/ExistingWallpaper.jpg')
+
+        self.setup.restore(snapshot)
+        self.assertIsNone(monitor.current_background)
+
+    def test_commit_timeout(self):
+        def command(command, result=None):
+            self.connection.command = FakeConnection.command.__get__(self.connection)
+            raise TimeoutError('timed out')
+
+        self.connection.clear()
+        self.connection.command = command
+
+        with self.assertRaises(CommandError):
+            self.setup.enable([{'model': 'DELL U2414H'}], transaction=True)
+
+        self.assertEqual(self.connection.command_list, [self.setup.snapshot().get_command()])
@@ -0,0 +1,118 @@
+import unittest
+from sway_monitors import Setup, WallpaperCache
+from sway_monitors.wallpaper import output_size
+import os
+import shutil
+import tempfile
+from .FakeConnection import FakeConnection
+
+try:
+    import PIL
+except ImportError:
+    PIL = None
+
+
+def copy_scaler(source, target, size, sizing):
+    shutil.copyfile(source, target)
+    return target
+
+
+class WallpaperCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.source = os.path.join(self.directory.name, 'wallpaper.jpg')
+        with open(self.source, 'wb') as f:
+            f.write(b'wallpaper')
+
+        self.scaled = []
+        self.cache = WallpaperCache(os.path.join(self.directory.name, 'cache'), max_entries=2, workers=1, scaler=self.scaler)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def scaler(self, source, target, size, sizing):
+        self.scaled.append((size, sizing))
+        return copy_scaler(source, target, size, sizing)
+
+    def test_prepare(self):
+        paths = self.cache.prepare(self.source, [(1920, 1080), (2560, 1080), (1920, 1080)])
+        self.assertEqual(self.scaled, [((1920, 1080), 'fill'), ((2560, 1080), 'fill')])
+        self.assertRegex(paths[(1920, 1080)], '-1920x1080-fill.jpg$')
+        self.assertTrue(all(os.path.exists(path) for path in paths.values()))
+
+        self.scaled = []
+        self.assertEqual(self.cache.prepare(self.source, [(2560, 1080), (1920, 1080)]), paths)
+        self.assertEqual(self.scaled, [])
+
+    def test_unscaled_sizing(self):
+        paths = self.cache.prepare(self.source, [(1920, 1080)], 'tile')
+        self.assertEqual(paths, {(1920, 1080): self.source})
+        self.assertEqual(self.scaled, [])
+
+    def test_non_existing(self):
+        with self.assertRaises(FileNotFoundError):
+            self.cache.get('NonExistingWallpaper.jpg', (1920, 1080))
+
+    def test_source_changed(self):
+        before = self.cache.get(self.source, (1920, 1080))
+        with open(self.source, 'wb') as f:
+            f.write(b'another wallpaper')
+
+        self.assertNotEqual(self.cache.get(self.source, (1920, 1080)), before)
+
+    def test_eviction(self):
+        first = self.cache.get(self.source, (1920, 1080))
+        second = self.cache.get(self.source, (2560, 1080))
+        os.utime(first, (0, 0))
+        os.utime(second, (1, 1))
+
+        # Using the first entry again makes the second one the least recently used
+        self.cache.get(self.source, (1920, 1080))
+        self.cache.get(self.source, (1280, 720))
+
+        self.assertTrue(os.path.exists(first))
+        self.assertFalse(os.path.exists(second))
+        self.assertEqual(len(os.listdir(self.cache.directory)), 2)
+
+    def test_output_size(self):
+        setup = Setup(connection=FakeConnection())
+        mode = setup.find_monitor({'name': 'DP-4'}).get_active_mode()
+        self.assertEqual(output_size(mode), (2560, 1080))
+        self.assertEqual(output_size(mode, '90'), (1080, 2560))
+
+    def test_setup_background(self):
+        connection = FakeConnection()
+        setup = Setup(connection=connection, wallpaper_cache=self.cache)
+        connection.clear()
+
+        setup.background(self.source)
+
+        self.assertEqual(len(connection.command_list), 1)
+        self.assertRegex(connection.command_list[0], '^output DP-3 bg \\S*-1920x1080-fill.jpg fill; output DP-4 bg \\S*-2560x1080-fill.jpg fill$')
+
+    def test_setup_enable(self):
+        connection = FakeConnection()
+        setup = Setup(connection=connection, wallpaper_cache=self.cache)
+        commands = setup.plan([{'name': 'DP-3'}, {'name': 'DP-4'}], background=self.source)
+        self.assertRegex(commands[-1], 'bg \\S*-2560x1080-fill.jpg fill$')
+
+        # Planning only works out the paths, nothing is scaled or written
+        self.assertEqual(self.scaled, [])
+        self.assertFalse(os.path.exists(self.cache.directory))
+
+        connection.clear()
+        setup.enable([{'name': 'DP-3'}, {'name': 'DP-4'}], background=self.source)
+        self.assertEqual(len(self.scaled), 2)
+        self.assertEqual(connection.command_list[-1], commands[-1])
+
+    @unittest.skipUnless(PIL, 'Pillow is not installed')
+    def test_scale_image(self):
+        from PIL import Image
+        from sway_monitors.wallpaper import scale_image
+
+        Image.new('RGB', (400, 300)).save(self.source, format='JPEG')
+        target = os.path.join(self.directory.name, 'scaled.jpg')
+        scale_image(self.source, target, (160, 90), 'fill')
+
+        with Image.open(target) as image:
+            self.assertEqual(image.size, (160, 90))
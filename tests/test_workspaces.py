@@ -0,0 +1,101 @@
+import unittest
+from sway_monitors import CommandError, Setup
+from .FakeConnection import FakeConnection
+
+
+class WorkspaceTest(unittest.TestCase):
+    def setUp(self):
+        self.connection = FakeConnection()
+        self.connection.workspaces = [
+            {'name': '1', 'output': 'DP-3', 'focused': True},
+            {'name': '2', 'output': 'DP-4', 'focused': False},
+            {'name': 'web "mail"', 'output': 'DP-4', 'focused': False},
+        ]
+        self.setup = Setup(connection=self.connection)
+        self.connection.clear()
+
+    def test_plan(self):
+        commands = self.setup.plan_workspaces({
+            '1': {'model':'DELL U2913WM', 'serial':'HFDVR4Z0NIRM'},
+            '2': {'name': 'DP-4'},
+            '3': {'name': 'DP-3'},
+        })
+
+        # Only workspace 1 is on the wrong output, the others are just assigned
+        self.assertEqual(commands, [
+            'workspace "1" output DP-4',
+            'workspace "2" output DP-4',
+            'workspace "3" output DP-3',
+            'workspace --no-auto-back-and-forth "1"',
+            'move workspace to output DP-4',
+            'workspace --no-auto-back-and-forth "1"',
+        ])
+
+    def test_quoting(self):
+        self.assertEqual(self.setup.plan_workspaces({'web "mail"': {'name': 'DP-4'}}), ['workspace "web \\"mail\\"" output DP-4'])
+
+    def test_enable(self):
+        self.setup.enable([{'name': 'DP-3'}, {'name': 'DP-4'}], transaction=True, workspaces={'2': {'name': 'DP-3'}})
+
+        # The outputs and the workspaces change in one round trip
+        self.assertEqual(self.connection.command_list, ['; '.join([
+            'output DP-3 position 0 0 resolution 1920x1080',
+            'output DP-4 position 1920 0 resolution 2560x1080',
+            'workspace "2" output DP-3',
+            'workspace --no-auto-back-and-forth "2"',
+            'move workspace to output DP-3',
+            'workspace --no-auto-back-and-forth "1"',
+        ])])
+
+    def test_disabled_output(self):
+        self.setup.enable([{'name': 'DP-3'}], transaction=True, workspaces={'1': {'name': 'DP-3'}, '2': {'name': 'DP-4'}})
+
+        # DP-4 is switched off, sway moves its workspaces so the rule for it is left out
+        self.assertEqual(self.connection.command_list, ['; '.join([
+            'output DP-4 disable',
+            'output DP-3 position 0 0 resolution 1920x1080',
+            'workspace "1" output DP-3',
+        ])])
+
+    def test_without_transaction(self):
+        self.setup.enable([{'name': 'DP-3'}, {'name': 'DP-4'}], workspaces={'2': {'name': 'DP-3'}})
+
+        self.assertEqual(len(self.connection.command_list), 3)
+        self.assertTrue(self.connection.command_list[-1].startswith('workspace "2" output DP-3'))
+
+    def test_no_rule_resolves(self):
+        self.setup.enable([{'name': 'DP-3'}], transaction=True, workspaces={'2': {'name': 'DP-4'}})
+        self.assertEqual(self.connection.command_list, ['output DP-4 disable; output DP-3 position 0 0 resolution 1920x1080'])
+
+        self.connection.clear()
+        self.setup.enable([{'name': 'DP-3'}], workspaces={'2': {'name': 'DP-4'}})
+        self.assertEqual(self.connection.command_list, ['output DP-4 disable', 'output DP-3 position 0 0 resolution 1920x1080'])
+
+    def test_failed_move(self):
+        self.connection.fail_on = ['move workspace']
+
+        with self.assertRaises(CommandError):
+            self.setup.enable([{'name': 'DP-3'}, {'name': 'DP-4'}], workspaces={'2': {'name': 'DP-3'}})
+
+        # The outputs, the workspaces and then the restored snapshot
+        self.assertEqual(len(self.connection.command_list), 4)
+        self.assertTrue(self.connection.command_list[-1].startswith('output DP-3 enable'))
+
+    def test_separator_in_name(self):
+        self.connection.fail_on = ['move workspace']
+
+        with self.assertRaises(CommandError) as context:
+            self.setup.enable([{'name': 'DP-3'}, {'name': 'DP-4'}], transaction=True, workspaces={'a; b': {'name': 'DP-3'}, '1': {'name': 'DP-4'}})
+
+        # The quoted ; does not shift the replies, the failed move is blamed and not the workspace after it
+        self.assertEqual(context.exception.failed, ['move workspace to output DP-4'])
+
+    def test_profile(self):
+        profiles = {'home': {
+            'monitors': [{'model': 'DELL U2414H'}, {'model':'DELL U2913WM', 'serial':'HFDVR4Z0NIRM'}],
+            'workspaces': {'1': {'model':'DELL U2913WM'}},
+        }}
+
+        self.assertEqual(self.setup.apply_profiles(profiles), 'home')
+        self.assertEqual(len(self.connection.command_list), 1)
+        self.assertIn('move workspace to output DP-4', self.connection.command_list[0])